@@ -0,0 +1,162 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+import metrics
+
+# Whether LLM calls made in the current context are background work. A context
+# variable rather than a thread-local, so threads that run work on a caller's
+# behalf can carry the flag over with contextvars.copy_context().
+_BACKGROUND = contextvars.ContextVar("llm_background", default=False)
+# Longest wait for a slot for interactive calls made in the current context, if not max_wait
+_MAX_WAIT = contextvars.ContextVar("llm_max_wait", default=None)
+
+
+class OverloadedError(Exception):
+    """Raised when an LLM call is refused because too many are in flight or queued.
+
+    ``status`` is 429 when the wait queue was already full and 503 when the
+    call waited in the queue for too long; ``retry_after`` is a suggested
+    delay in whole seconds.
+    """
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds concurrent LLM calls, queueing a limited number of callers.
+
+    At most ``max_in_flight`` calls run at once. Further interactive callers
+    wait, up to ``max_queued`` of them and for at most ``max_wait`` seconds
+    each (or as long as ``wait_limit()`` allows); beyond that they are refused straight away. Calls made inside
+    ``background()`` wait without a queue limit or timeout and only take a
+    free slot when no interactive caller is waiting, so background work
+    never crowds out requests.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queued: int = 32, max_wait: float = 30):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self._in_flight = 0
+        self._queued = 0
+        self._background_queued = 0
+        # Smoothed duration of a call holding a slot, for Retry-After estimates
+        self._call_seconds = 5.0
+        self._rejected = {"queue_full": 0, "timeout": 0}
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def background(self) -> Iterator[None]:
+        """Mark LLM calls made in this context, i.e. by this thread and work it hands on with its context, as background work"""
+        token = _BACKGROUND.set(True)
+        try:
+            yield
+        finally:
+            _BACKGROUND.reset(token)
+
+    @contextmanager
+    def wait_limit(self, max_wait: float) -> Iterator[None]:
+        """Let interactive LLM calls made in this context wait up to ``max_wait`` seconds for a slot.
+
+        For work a user is waiting on but not holding a request open for,
+        such as an asynchronous upload: it still queues ahead of background
+        work and is still refused when the queue is full.
+        """
+        token = _MAX_WAIT.set(max_wait)
+        try:
+            yield
+        finally:
+            _MAX_WAIT.reset(token)
+
+    def check(self):
+        """Refuse immediately if an interactive call could not even be queued"""
+        with self._condition:
+            if self._in_flight >= self.max_in_flight and self._queued >= self.max_queued:
+                raise self._reject("queue_full")
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one in-flight slot for the duration of an LLM call"""
+        started = time.perf_counter()
+        with self._condition:
+            if _BACKGROUND.get():
+                self._wait_background()
+            else:
+                self._wait_interactive(started)
+            self._in_flight += 1
+            self._update_gauges()
+        metrics.LLM_QUEUE_WAIT.observe(time.perf_counter() - started)
+
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._call_seconds = 0.8 * self._call_seconds + 0.2 * (time.perf_counter() - acquired)
+                self._update_gauges()
+                self._condition.notify_all()
+
+    def _wait_interactive(self, started: float):
+        if self._in_flight < self.max_in_flight:
+            return
+        if self._queued >= self.max_queued:
+            raise self._reject("queue_full")
+        self._queued += 1
+        self._update_gauges()
+        try:
+            max_wait = _MAX_WAIT.get()
+            deadline = started + (self.max_wait if max_wait is None else max_wait)
+            while self._in_flight >= self.max_in_flight:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise self._reject("timeout")
+                self._condition.wait(remaining)
+        finally:
+            self._queued -= 1
+            self._update_gauges()
+
+    def _wait_background(self):
+        self._background_queued += 1
+        self._update_gauges()
+        try:
+            # Interactive callers take any free slot first
+            while self._in_flight >= self.max_in_flight or self._queued:
+                self._condition.wait()
+        finally:
+            self._background_queued -= 1
+            self._update_gauges()
+
+    def _reject(self, reason: str) -> OverloadedError:
+        self._rejected[reason] += 1
+        metrics.LLM_REJECTIONS.inc(reason)
+        # Roughly how long until the callers ahead of a retry have been served
+        retry_after = max(1, math.ceil(self._call_seconds * (self._queued / self.max_in_flight + 1)))
+        if reason == "queue_full":
+            return OverloadedError("Too many AI requests are queued, please retry shortly", 429, retry_after)
+        return OverloadedError("Timed out waiting for the AI service, please retry shortly", 503, retry_after)
+
+    def _update_gauges(self):
+        metrics.LLM_IN_FLIGHT.set(self._in_flight)
+        metrics.LLM_QUEUE_DEPTH.set(self._queued, "interactive")
+        metrics.LLM_QUEUE_DEPTH.set(self._background_queued, "background")
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls in flight, queue depths and rejection counters since start-up"""
+        with self._condition:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queued": self._queued,
+                "max_queued": self.max_queued,
+                "background_queued": self._background_queued,
+                "average_call_seconds": round(self._call_seconds, 3),
+                "rejected": dict(self._rejected)
+            }
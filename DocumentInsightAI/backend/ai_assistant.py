@@ -1,41 +1,68 @@
 import os
 import json
-from typing import List, Tuple, Dict, Any
-from openai import OpenAI
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, Dict
+from openai import AsyncOpenAI
+from admission import AdmissionController, OverloadedError
+from llm_transport import LLMTransport
+from summarizer import MapReduceSummarizer
 
 class AIAssistant:
     """Handles AI interactions for document analysis and question generation"""
     
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, summary_chunk_tokens: int = 16000, summary_workers: int = 4,
+                 transport: Optional[LLMTransport] = None, base_url: Optional[str] = None,
+                 admission: Optional[AdmissionController] = None):
+        # Every model call takes a slot from the admission controller, if one is given
+        self.admission = admission
+        # The transport retries and times out calls itself, so the client does neither
+        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url, max_retries=0)
+        self.transport = transport if transport is not None else LLMTransport("openai")
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
         self.model = "gpt-4o"
+        # Long documents are summarized part by part, in parallel, instead of truncated
+        self.summarizer = MapReduceSummarizer(
+            self._complete_summary, chunk_tokens=summary_chunk_tokens, max_workers=summary_workers
+        )
     
     def generate_summary(self, document_content: str) -> str:
         """Generate a concise summary of the document (≤150 words)"""
         try:
+            if self.summarizer.needed(document_content):
+                return self.summarizer.summarize(document_content, 150)
+            
             prompt = f"""
             Please provide a concise summary of the following document in no more than 150 words.
             Focus on the main points, key findings, and core themes.
             
             Document:
-            {document_content[:4000]}  # Limit input to avoid token limits
+            {document_content}
             
             Summary (≤150 words):
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.3
-            )
-            
-            return response.choices[0].message.content.strip()
+            return self._complete_summary(prompt)
+        except OverloadedError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate summary: {str(e)}")
     
+    def _complete_summary(self, prompt: str) -> str:
+        """Send one summarization prompt and return the reply"""
+        response = self._run("summary", lambda: self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=400,
+            temperature=0.3
+        ))
+        return response.choices[0].message.content.strip()
+    
+    def _run(self, operation: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Make one model call through the transport, holding an admission slot if there is a controller"""
+        with self.admission.slot() if self.admission is not None else nullcontext():
+            return self.transport.run(operation, call)
+    
     def answer_question(self, question: str, document_content: str, conversation_history: List[Tuple]) -> Tuple[str, str]:
         """Answer a question based on the document content with justification"""
         try:
@@ -68,15 +95,17 @@ class AIAssistant:
             JUSTIFICATION: [explanation of which parts of the document support this answer]
             """
             
-            response = self.client.chat.completions.create(
+            response = self._run("answer", lambda: self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800,
                 temperature=0.2
-            )
+            ))
             
             content = response.choices[0].message.content.strip()
             return self._parse_answer_response(content)
+        except OverloadedError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to answer question: {str(e)}")
     
@@ -102,16 +131,18 @@ class AIAssistant:
             {{"questions": ["question1", "question2", "question3"]}}
             """
             
-            response = self.client.chat.completions.create(
+            response = self._run("questions", lambda: self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
                 max_tokens=400,
                 temperature=0.4
-            )
+            ))
             
             result = json.loads(response.choices[0].message.content)
             return result.get("questions", [])
+        except OverloadedError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate challenge questions: {str(e)}")
     
@@ -140,15 +171,17 @@ class AIAssistant:
             }}
             """
             
-            response = self.client.chat.completions.create(
+            response = self._run("evaluation", lambda: self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
                 max_tokens=600,
                 temperature=0.2
-            )
+            ))
             
             return json.loads(response.choices[0].message.content)
+        except OverloadedError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to evaluate answer: {str(e)}")
     
@@ -1,38 +1,592 @@
-from flask import Flask, request, jsonify, session, send_from_directory, render_template_string
+from flask import Flask, Response, g, request, jsonify, session, send_from_directory, render_template_string, stream_with_context
 from flask_cors import CORS
 import os
+import gzip
+import hashlib
+import hmac
 import json
+import multiprocessing
+import threading
+import time
 import uuid
-import tempfile
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
 from werkzeug.utils import secure_filename
+from admission import AdmissionController, OverloadedError
+from artifact_cache import ArtifactCache
+from chunked_uploads import ChunkedUploadStore, UploadError
 from document_processor import DocumentProcessor
-from gemini_ai_assistant import GeminiAIAssistant
+from uploads import UploadRequest, UploadedFile
+from assistants import CachedDocument, FallbackText, LazyAssistant
+from jobs import Job, JobQueue, QueueFullError
+from llm_transport import LLMTransport
+from session_store import SessionStore, SharedSessionStore
+from retrieval import CHARS_PER_TOKEN, CorpusIndex, IndexCache, estimate_tokens, pack_passages
+import metrics
+from profiling import PROFILE_MODES, RequestProfiler
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
+app.request_class = UploadRequest
 app.secret_key = os.urandom(24)
 CORS(app)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'txt'}
+EXTENSION_TYPES = {'pdf': 'application/pdf', 'txt': 'text/plain'}  # Content type of chunked uploads by extension
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+PDF_EXTRACT_WORKERS = os.cpu_count() or 1  # Process pool size for PDF page extraction (1 disables)
+PDF_PARALLEL_MIN_PAGES = 64  # Smaller PDFs are extracted in-process
+ARTIFACT_CACHE_PATH = os.path.join('cache', 'artifacts.sqlite3')
+ARTIFACT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # LRU-evicted beyond this
+UPLOAD_JOB_WORKERS = 2  # Background threads for ?async=1 uploads
+UPLOAD_JOB_MAX_PENDING = 32  # Queued or running async uploads before returning 503
+SESSION_MAX_BYTES = 512 * 1024 * 1024  # Least recently used sessions are evicted beyond this
+SESSION_TTL = 6 * 60 * 60  # Seconds a session may sit idle before it expires
+ASK_BATCH_MAX_QUESTIONS = 50  # Questions accepted by one /api/ask-batch call
+ASK_BATCH_CONCURRENCY = 4  # LLM calls in flight per batch
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')  # 'shared' to serve sessions from any worker process
+SESSION_SHARED_DIR = 'sessions'  # Text files and SQLite index of the shared backend
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')  # Enables X-Profile request profiling when set
+PROFILE_DIR = 'profiles'  # Where profiled requests write .pstats / .collapsed output
+CORPUS_MAX_FILES = 200  # Files accepted by one /api/upload-corpus call
+CORPUS_MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # Request size limit for /api/upload-corpus
+CORPUS_CHUNK_SIZE = 1500  # Characters per retrievable corpus chunk
+CORPUS_CHUNK_OVERLAP = 200  # Characters shared by consecutive chunks
+CORPUS_TOP_K = 8  # Passages retrieved per corpus question
+CORPUS_INDEX_CACHE_SIZE = 4  # Corpus indexes kept built in each worker process
+PRECOMPUTE_QUESTIONS = os.environ.get('PRECOMPUTE_QUESTIONS', '1') == '1'  # Generate challenge questions right after upload
+PRECOMPUTE_WORKERS = 1  # Background threads for speculative question generation
+PRECOMPUTE_MAX_PENDING = 8  # Queued speculative jobs before new uploads skip speculation
+PRECOMPUTE_WAIT_TIMEOUT = 60  # Seconds /api/generate-questions waits for an in-flight job
+HISTORY_PAGE_SIZE = 100  # Most conversation turns returned by one /api/conversation-history call
+COMPRESS_MIN_BYTES = 1024  # JSON responses at least this large are gzipped for clients that accept it
+LLM_MAX_IN_FLIGHT = 8  # Concurrent LLM calls across all requests and background jobs
+LLM_MAX_QUEUED = 32  # Requests waiting for an LLM slot before new ones get 429
+LLM_MAX_WAIT = 30  # Seconds a request may wait for an LLM slot before getting 503
+UPLOAD_LLM_MAX_WAIT = 300  # Seconds an asynchronous upload may wait for an LLM slot before its job fails
+ASSISTANT_BACKEND = os.environ.get('ASSISTANT_BACKEND', 'gemini')  # gemini, openai, simple or local
+ASSISTANT_WARMUP = os.environ.get('ASSISTANT_WARMUP', 'background')  # eager, background or lazy (first request)
+CHUNKED_UPLOAD_DIR = os.path.join(UPLOAD_FOLDER, 'chunked')  # In-progress chunked uploads
+CHUNKED_PART_SIZE = 8 * 1024 * 1024  # Bytes per part; must stay under MAX_CONTENT_LENGTH
+CHUNKED_MAX_FILE_BYTES = 2 * 1024 * 1024 * 1024  # Largest file accepted through chunked upload
+CHUNKED_UPLOAD_TTL = 24 * 60 * 60  # Seconds before an unfinished chunked upload is removed
+ANSWER_CONTEXT = os.environ.get('ANSWER_CONTEXT', 'retrieval')  # 'retrieval' sends large documents as top passages, 'full' always whole
+RETRIEVAL_MIN_TOKENS = 8000  # Documents up to this many estimated tokens are always sent whole
+RETRIEVAL_TOKEN_BUDGET = 4000  # Estimated tokens of excerpts sent per answer or evaluation
+RETRIEVAL_CHUNK_TOKENS = 300  # Approximate tokens per indexed chunk
+RETRIEVAL_CHUNK_OVERLAP = 30  # Tokens shared by consecutive chunks
+RETRIEVAL_TOP_K = 24  # Best chunks considered before packing them into the budget
+RETRIEVAL_INDEX_CACHE_SIZE = 16  # Document indexes kept built in each worker process
+CONTEXT_CACHE = os.environ.get('CONTEXT_CACHE', '1') == '1'  # Keep each session's document in the model's context cache
+CONTEXT_CACHE_MIN_TOKENS = 4096  # Smallest document, in estimated tokens, worth caching (the model's minimum)
+SUMMARY_CHUNK_TOKENS = 16000  # Longer documents are summarized in parts of about this many tokens, then combined
+SUMMARY_MAX_WORKERS = 4  # Part summaries generated at once for one document
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL') or None  # Send LLM calls to another endpoint, e.g. a local fake server
+LLM_TIMEOUT = 60  # Seconds one LLM call may take, retries included
+LLM_MAX_ATTEMPTS = 3  # Attempts at an LLM call that fails with a timeout, dropped connection, 429 or 5xx
+LLM_BACKOFF_BASE = 0.5  # Seconds; the retry delay is random up to this, doubling each attempt
+LLM_BACKOFF_MAX = 8  # Longest delay between attempts, in seconds
+LLM_CIRCUIT_FAILURES = 5  # Consecutive failed attempts that open the circuit and fail calls fast
+LLM_CIRCUIT_RESET = 30  # Seconds the circuit stays open before a trial call is let through
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['PDF_EXTRACT_WORKERS'] = PDF_EXTRACT_WORKERS
+app.config['PDF_PARALLEL_MIN_PAGES'] = PDF_PARALLEL_MIN_PAGES
+app.config['ARTIFACT_CACHE_PATH'] = ARTIFACT_CACHE_PATH
+app.config['ARTIFACT_CACHE_MAX_BYTES'] = ARTIFACT_CACHE_MAX_BYTES
+app.config['UPLOAD_JOB_WORKERS'] = UPLOAD_JOB_WORKERS
+app.config['UPLOAD_JOB_MAX_PENDING'] = UPLOAD_JOB_MAX_PENDING
+app.config['SESSION_MAX_BYTES'] = SESSION_MAX_BYTES
+app.config['SESSION_TTL'] = SESSION_TTL
+app.config['ASK_BATCH_MAX_QUESTIONS'] = ASK_BATCH_MAX_QUESTIONS
+app.config['ASK_BATCH_CONCURRENCY'] = ASK_BATCH_CONCURRENCY
+app.config['SESSION_BACKEND'] = SESSION_BACKEND
+app.config['SESSION_SHARED_DIR'] = SESSION_SHARED_DIR
+app.config['PROFILE_TOKEN'] = PROFILE_TOKEN
+app.config['PROFILE_DIR'] = PROFILE_DIR
+app.config['CORPUS_MAX_FILES'] = CORPUS_MAX_FILES
+app.config['CORPUS_CHUNK_SIZE'] = CORPUS_CHUNK_SIZE
+app.config['CORPUS_CHUNK_OVERLAP'] = CORPUS_CHUNK_OVERLAP
+app.config['CORPUS_TOP_K'] = CORPUS_TOP_K
+app.config['CORPUS_INDEX_CACHE_SIZE'] = CORPUS_INDEX_CACHE_SIZE
+app.config['PRECOMPUTE_QUESTIONS'] = PRECOMPUTE_QUESTIONS
+app.config['PRECOMPUTE_WORKERS'] = PRECOMPUTE_WORKERS
+app.config['PRECOMPUTE_MAX_PENDING'] = PRECOMPUTE_MAX_PENDING
+app.config['PRECOMPUTE_WAIT_TIMEOUT'] = PRECOMPUTE_WAIT_TIMEOUT
+app.config['HISTORY_PAGE_SIZE'] = HISTORY_PAGE_SIZE
+app.config['COMPRESS_MIN_BYTES'] = COMPRESS_MIN_BYTES
+app.config['LLM_MAX_IN_FLIGHT'] = LLM_MAX_IN_FLIGHT
+app.config['LLM_MAX_QUEUED'] = LLM_MAX_QUEUED
+app.config['LLM_MAX_WAIT'] = LLM_MAX_WAIT
+app.config['UPLOAD_LLM_MAX_WAIT'] = UPLOAD_LLM_MAX_WAIT
+app.config['ASSISTANT_BACKEND'] = ASSISTANT_BACKEND
+app.config['ASSISTANT_WARMUP'] = ASSISTANT_WARMUP
+app.config['CHUNKED_UPLOAD_DIR'] = CHUNKED_UPLOAD_DIR
+app.config['CHUNKED_PART_SIZE'] = CHUNKED_PART_SIZE
+app.config['CHUNKED_MAX_FILE_BYTES'] = CHUNKED_MAX_FILE_BYTES
+app.config['CHUNKED_UPLOAD_TTL'] = CHUNKED_UPLOAD_TTL
+app.config['ANSWER_CONTEXT'] = ANSWER_CONTEXT
+app.config['RETRIEVAL_MIN_TOKENS'] = RETRIEVAL_MIN_TOKENS
+app.config['RETRIEVAL_TOKEN_BUDGET'] = RETRIEVAL_TOKEN_BUDGET
+app.config['RETRIEVAL_CHUNK_TOKENS'] = RETRIEVAL_CHUNK_TOKENS
+app.config['RETRIEVAL_CHUNK_OVERLAP'] = RETRIEVAL_CHUNK_OVERLAP
+app.config['RETRIEVAL_TOP_K'] = RETRIEVAL_TOP_K
+app.config['RETRIEVAL_INDEX_CACHE_SIZE'] = RETRIEVAL_INDEX_CACHE_SIZE
+app.config['CONTEXT_CACHE'] = CONTEXT_CACHE
+app.config['CONTEXT_CACHE_MIN_TOKENS'] = CONTEXT_CACHE_MIN_TOKENS
+app.config['SUMMARY_CHUNK_TOKENS'] = SUMMARY_CHUNK_TOKENS
+app.config['SUMMARY_MAX_WORKERS'] = SUMMARY_MAX_WORKERS
+app.config['LLM_BASE_URL'] = LLM_BASE_URL
+app.config['LLM_TIMEOUT'] = LLM_TIMEOUT
+app.config['LLM_MAX_ATTEMPTS'] = LLM_MAX_ATTEMPTS
+app.config['LLM_BACKOFF_BASE'] = LLM_BACKOFF_BASE
+app.config['LLM_BACKOFF_MAX'] = LLM_BACKOFF_MAX
+app.config['LLM_CIRCUIT_FAILURES'] = LLM_CIRCUIT_FAILURES
+app.config['LLM_CIRCUIT_RESET'] = LLM_CIRCUIT_RESET
+app.config['UPLOAD_SIZE_LIMITS'] = {'upload_corpus': CORPUS_MAX_CONTENT_LENGTH}
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+def _release_session(session_id: str, doc_session: Dict[str, Any]):
+    """Delete the context cache of a session that was evicted, expired or deleted"""
+    context_cache = doc_session.get('context_cache')
+    if context_cache:
+        context_cache_cleanup.submit(ai_assistant.delete_context_cache, context_cache['name'])
 
-# Initialize processors
-doc_processor = DocumentProcessor()
-ai_assistant = GeminiAIAssistant()
+# PDF extraction workers are started by a fork server (or spawned) and re-import
+# this module as __mp_main__ when it is run as a script. They only need
+# document_processor, so the services are only built in the serving process.
+if multiprocessing.current_process().name == 'MainProcess':
+    # Ensure upload directory exists
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# In-memory storage for demo (in production, use Redis or database)
-document_sessions = {}
+    # Initialize processors
+    doc_processor = DocumentProcessor(
+        parallel_workers=app.config['PDF_EXTRACT_WORKERS'],
+        parallel_min_pages=app.config['PDF_PARALLEL_MIN_PAGES']
+    )
+    llm_admission = AdmissionController(
+        max_in_flight=app.config['LLM_MAX_IN_FLIGHT'],
+        max_queued=app.config['LLM_MAX_QUEUED'],
+        max_wait=app.config['LLM_MAX_WAIT']
+    )
+    chunked_uploads = ChunkedUploadStore(
+        app.config['CHUNKED_UPLOAD_DIR'],
+        part_size=app.config['CHUNKED_PART_SIZE'],
+        max_file_bytes=app.config['CHUNKED_MAX_FILE_BYTES'],
+        ttl=app.config['CHUNKED_UPLOAD_TTL']
+    )
+    # Only the configured backend is imported, when it is first used or warmed up
+    llm_transport = LLMTransport(
+        app.config['ASSISTANT_BACKEND'],
+        deadline=app.config['LLM_TIMEOUT'],
+        max_attempts=app.config['LLM_MAX_ATTEMPTS'],
+        backoff_base=app.config['LLM_BACKOFF_BASE'],
+        backoff_max=app.config['LLM_BACKOFF_MAX'],
+        failure_threshold=app.config['LLM_CIRCUIT_FAILURES'],
+        reset_timeout=app.config['LLM_CIRCUIT_RESET']
+    )
+    ai_assistant = LazyAssistant(
+        app.config['ASSISTANT_BACKEND'],
+        admission=llm_admission,
+        transport=llm_transport,
+        base_url=app.config['LLM_BASE_URL'],
+        summary_chunk_tokens=app.config['SUMMARY_CHUNK_TOKENS'],
+        summary_workers=app.config['SUMMARY_MAX_WORKERS']
+    )
+    if app.config['ASSISTANT_WARMUP'] == 'eager':
+        ai_assistant.warmup()
+    elif app.config['ASSISTANT_WARMUP'] == 'background':
+        threading.Thread(target=ai_assistant.warmup, name="assistant-warmup", daemon=True).start()
+    artifact_cache = ArtifactCache(
+        app.config['ARTIFACT_CACHE_PATH'],
+        max_bytes=app.config['ARTIFACT_CACHE_MAX_BYTES']
+    )
+    corpus_indexes = IndexCache(app.config['CORPUS_INDEX_CACHE_SIZE'])
+    document_indexes = IndexCache(app.config['RETRIEVAL_INDEX_CACHE_SIZE'])
+    # Context caches of ended sessions are deleted off the request path
+    context_cache_cleanup = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-cleanup")
+
+    # Sessions are assigned back after every change so the shared backend sees it
+    if app.config['SESSION_BACKEND'] == 'shared':
+        document_sessions = SharedSessionStore(
+            app.config['SESSION_SHARED_DIR'],
+            max_bytes=app.config['SESSION_MAX_BYTES'],
+            ttl=app.config['SESSION_TTL'],
+            on_remove=_release_session
+        )
+    else:
+        # In-memory storage for demo (in production, use Redis or database)
+        document_sessions = SessionStore(
+            max_bytes=app.config['SESSION_MAX_BYTES'],
+            ttl=app.config['SESSION_TTL'],
+            on_remove=_release_session
+        )
+
+    # With the shared backend, job status is published to its index so any worker can report it
+    shared_jobs = document_sessions if app.config['SESSION_BACKEND'] == 'shared' else None
+    upload_jobs = JobQueue(
+        max_workers=app.config['UPLOAD_JOB_WORKERS'],
+        max_pending=app.config['UPLOAD_JOB_MAX_PENDING'],
+        shared=shared_jobs
+    )
+    # Separate, small pool so speculative work never takes threads from uploads or requests
+    question_jobs = JobQueue(
+        max_workers=app.config['PRECOMPUTE_WORKERS'],
+        max_pending=app.config['PRECOMPUTE_MAX_PENDING'],
+        shared=shared_jobs
+    )
+    # Hands precomputed questions between a job and /api/generate-questions on the same session dict
+    precompute_lock = threading.Lock()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def process_document(upload: UploadedFile,
+                     report: Optional[Callable[[str, Optional[int], Optional[int]], None]] = None) -> Dict[str, Any]:
+    """Extract and summarize an upload and open a document session for it.
+
+    report, if given, is called with (stage, current, total) as processing advances.
+    """
+    report = report or (lambda *args: None)
+    
+    # Generate session ID
+    session_id = str(uuid.uuid4())
+    
+    # Reuse artifacts from an earlier upload of the same bytes
+    with metrics.timed("hash"):
+        content_hash = upload.content_hash()
+    cache_key = artifact_cache.key_for(content_hash, *ai_assistant.cache_identity)
+    artifacts = artifact_cache.get(cache_key) or {}
+    
+    if 'content' in artifacts:
+        text_content = artifacts['content']
+    else:
+        # Extract text straight from the spooled upload
+        report('extracting')
+        with metrics.timed("extract"):
+            text_content = doc_processor.extract_text(
+                upload, lambda page, pages: report('extracting', page, pages)
+            )
+    
+    # Upload the text to the model's context cache once, for every later call to reference
+    context_cache = _create_context_cache(text_content)
+    document = CachedDocument(context_cache['name'], text_content) if context_cache else text_content
+    
+    stored = False
+    try:
+        if 'summary' in artifacts:
+            summary = artifacts['summary']
+        else:
+            # Generate summary
+            report('summarizing')
+            summary = ai_assistant.generate_summary(document)
+            # A fallback written without the model is not kept, so the next upload tries the model again
+            artifact_cache.put(cache_key, {'content': text_content} if isinstance(summary, FallbackText)
+                               else {'content': text_content, 'summary': summary})
+        
+        # Store document session
+        document_sessions[session_id] = {
+            'filename': upload.name,
+            'content': text_content,
+            'summary': summary,
+            'conversation_history': [],
+            'challenge_questions': None,
+            'user_answers': [],
+            'evaluations': [],
+            'context_cache': context_cache
+        }
+        stored = True
+        
+        # Index a large document now so its first question does not pay for it
+        if _uses_retrieval(text_content):
+            _document_index(session_id, text_content)
+        
+        if app.config['PRECOMPUTE_QUESTIONS']:
+            _precompute_questions(session_id, document)
+    except Exception:
+        # Nothing will reference the context cache; delete it now rather than leave it billed until it expires
+        if stored:
+            try:
+                # Its on_remove hook deletes the cache
+                del document_sessions[session_id]
+            except KeyError:
+                pass
+        elif context_cache:
+            _release_session(session_id, {'context_cache': context_cache})
+        raise
+    
+    return {
+        "session_id": session_id,
+        "filename": upload.name,
+        "summary": summary
+    }
+
+def _create_context_cache(text_content: str) -> Optional[Dict[str, Any]]:
+    """Cache a new session's text with the model for as long as the session lives, if the backend supports it.
+
+    Documents answered from retrieved excerpts are not cached: only question
+    generation would read the cache, which is not worth paying for.
+    """
+    if not (app.config['CONTEXT_CACHE'] and hasattr(ai_assistant, 'create_context_cache')
+            and estimate_tokens(text_content) >= app.config['CONTEXT_CACHE_MIN_TOKENS']
+            and not _uses_retrieval(text_content)):
+        return None
+    return ai_assistant.create_context_cache(text_content, app.config['SESSION_TTL'])
+
+def _full_document(session_id: str, doc_session: Dict[str, Any]) -> Union[str, CachedDocument]:
+    """A session's document as a handle to its context cache, or as its text if it has none.
+
+    Sessions expire after SESSION_TTL idle seconds, so a cache that is past
+    half of that is extended on use to outlive the session's next idle spell.
+    """
+    context_cache = doc_session.get('context_cache')
+    if not context_cache:
+        return doc_session['content']
+    ttl = app.config['SESSION_TTL']
+    if context_cache['expires'] - time.time() < ttl / 2:
+        try:
+            expires = ai_assistant.extend_context_cache(context_cache['name'], ttl)
+        except Exception:
+            # The upstream is struggling, not the cache; keep using it and extend it on a later call
+            return CachedDocument(context_cache['name'], doc_session['content'])
+        if expires is None:
+            doc_session['context_cache'] = None
+            document_sessions[session_id] = doc_session
+            return doc_session['content']
+        context_cache['expires'] = expires
+        document_sessions[session_id] = doc_session
+    return CachedDocument(context_cache['name'], doc_session['content'])
+
+def _uses_retrieval(text_content: str) -> bool:
+    """Whether answers about this text are given from retrieved excerpts rather than the full text"""
+    return (app.config['ANSWER_CONTEXT'] == 'retrieval'
+            and getattr(ai_assistant, 'supports_excerpts', False)
+            and estimate_tokens(text_content) > app.config['RETRIEVAL_MIN_TOKENS'])
+
+def _document_index(session_id: str, text_content: str) -> CorpusIndex:
+    """The chunk index of a document session, built on first use in this worker"""
+    def build() -> CorpusIndex:
+        with metrics.timed("index"):
+            spans = doc_processor.chunk_spans(
+                text_content, app.config['RETRIEVAL_CHUNK_TOKENS'], app.config['RETRIEVAL_CHUNK_OVERLAP'], by_tokens=True
+            )
+            return CorpusIndex(text_content, ((0, 1, start, end) for start, end in spans))
+    return document_indexes.get(session_id, build)
+
+def _document_for(session_id: str, doc_session: Dict[str, Any], query: str) -> Union[str, CachedDocument, List[Dict[str, Any]]]:
+    """A session's full document, or the excerpts most relevant to ``query`` if the document is too large to send whole"""
+    text_content = doc_session['content']
+    if not _uses_retrieval(text_content):
+        return _full_document(session_id, doc_session)
+    index = _document_index(session_id, text_content)
+    with metrics.timed("retrieve"):
+        spans = pack_passages(index.search(query, app.config['RETRIEVAL_TOP_K']), app.config['RETRIEVAL_TOKEN_BUDGET'])
+    if not spans:
+        # Nothing matched the query; the opening of the document is the best guess
+        spans = [(0, 0, app.config['RETRIEVAL_TOKEN_BUDGET'] * CHARS_PER_TOKEN)]
+    return [{"start": start, "end": end, "text": text_content[start:end]} for _, start, end in spans]
+
+def _passage_offsets(document: Union[str, CachedDocument, List[Dict[str, Any]]]) -> Optional[List[Dict[str, int]]]:
+    """Character spans of the excerpts sent to the model, or None if it saw the full text"""
+    if not isinstance(document, list):
+        return None
+    return [{"start": excerpt['start'], "end": excerpt['end']} for excerpt in document]
+
+def _precompute_questions(session_id: str, document: Union[str, CachedDocument]):
+    """Speculatively queue challenge question generation for a new session"""
+    try:
+        job = question_jobs.submit(_run_precompute_job, session_id, document)
+    except QueueFullError:
+        # Speculation is optional; the endpoint generates on demand instead
+        metrics.QUESTION_PRECOMPUTE.inc("skipped")
+        return
+    metrics.QUESTION_PRECOMPUTE.inc("queued")
+    doc_session = document_sessions.get(session_id)
+    if doc_session is not None:
+        doc_session['precompute_job'] = job.id
+        document_sessions[session_id] = doc_session
+
+def _run_precompute_job(job: Job, session_id: str, document: Union[str, CachedDocument]) -> Dict[str, Any]:
+    """Background job body for speculative question generation"""
+    job.update('generating')
+    with llm_admission.background():
+        questions = ai_assistant.generate_challenge_questions(document)
+    # Leave the questions on the session unless the endpoint has already claimed the job
+    doc_session = document_sessions.get(session_id)
+    if doc_session is not None:
+        with precompute_lock:
+            claimed = doc_session.pop('precompute_job', None) != job.id
+            if not claimed:
+                doc_session['precomputed_questions'] = questions
+        if not claimed:
+            document_sessions[session_id] = doc_session
+    return {"questions": questions}
+
+def _claim_precomputed_questions(doc_session: Dict[str, Any]) -> Optional[List[str]]:
+    """Take the session's speculatively generated questions, waiting for them if still in flight"""
+    with precompute_lock:
+        questions = doc_session.pop('precomputed_questions', None)
+        job_id = doc_session.pop('precompute_job', None)
+    if questions is not None:
+        metrics.QUESTION_PRECOMPUTE.inc("hit")
+        return questions
+    if job_id is None:
+        return None
+    # The job may belong to another worker process, or have been pruned
+    result = question_jobs.wait_result(job_id, app.config['PRECOMPUTE_WAIT_TIMEOUT'])
+    if result:
+        metrics.QUESTION_PRECOMPUTE.inc("waited")
+        return result['questions']
+    metrics.QUESTION_PRECOMPUTE.inc("missed")
+    return None
+
+def _run_upload_job(job: Job, upload: UploadedFile) -> Dict[str, Any]:
+    """Background job body for asynchronous uploads"""
+    # A user is waiting on the upload, so it is not background work; it only gets a longer wait
+    with upload, llm_admission.wait_limit(app.config['UPLOAD_LLM_MAX_WAIT']):
+        return process_document(upload, job.update)
+
+def process_corpus(uploads: List[UploadedFile],
+                   report: Optional[Callable[[str, Optional[int], Optional[int]], None]] = None) -> Dict[str, Any]:
+    """Extract many uploads in parallel, index them jointly and open a corpus session.
+
+    Every chunk is tagged with its source document and page. Files that fail
+    to extract are reported and left out rather than failing the corpus.
+    """
+    report = report or (lambda *args: None)
+    
+    # Generate session ID
+    session_id = str(uuid.uuid4())
+    
+    report('extracting', 0, len(uploads))
+    with metrics.timed("extract"):
+        results = doc_processor.extract_pages_many(
+            uploads, lambda done, total: report('extracting', done, total)
+        )
+    
+    # Join the documents into one text; chunk rows are (document, page, start, end)
+    documents, chunks, pieces, failed = [], [], [], []
+    offset = 0
+    for upload, pages in zip(uploads, results):
+        if isinstance(pages, Exception):
+            failed.append({"filename": upload.name, "error": str(pages)})
+            continue
+        text = "".join(page.text for page in pages).rstrip()
+        if not text:
+            failed.append({"filename": upload.name, "error": "No text could be extracted from the document"})
+            continue
+        page_starts = [page.start for page in pages]
+        for start, end in doc_processor.chunk_spans(text, app.config['CORPUS_CHUNK_SIZE'], app.config['CORPUS_CHUNK_OVERLAP']):
+            page_number = pages[bisect_right(page_starts, start) - 1].page_number
+            chunks.append([len(documents), page_number, offset + start, offset + end])
+        documents.append({'filename': upload.name, 'pages': len(pages), 'start': offset, 'end': offset + len(text)})
+        pieces.extend((text, "\n\n"))
+        offset += len(text) + 2
+    
+    if not documents:
+        raise ValueError("No text could be extracted from any of the files")
+    
+    content = "".join(pieces)
+    report('indexing')
+    with metrics.timed("index"):
+        corpus_indexes.put(session_id, CorpusIndex(content, chunks))
+    
+    # The corpus is never summarized as a whole; questions are answered from retrieved passages
+    summary = f"Corpus of {len(documents)} documents ({len(chunks)} indexed passages): " + ", ".join(
+        document['filename'] for document in documents
+    )
+    
+    # Store corpus session
+    document_sessions[session_id] = {
+        'type': 'corpus',
+        'filename': f"{len(documents)} documents",
+        'content': content,
+        'summary': summary,
+        'documents': documents,
+        'chunks': chunks,
+        'conversation_history': [],
+        'challenge_questions': None,
+        'user_answers': [],
+        'evaluations': []
+    }
+    
+    return {
+        "session_id": session_id,
+        "documents": [{"filename": document['filename'], "pages": document['pages']} for document in documents],
+        "failed": failed,
+        "passages": len(chunks),
+        "summary": summary
+    }
+
+def _run_corpus_job(job: Job, uploads: List[UploadedFile]) -> Dict[str, Any]:
+    """Background job body for asynchronous corpus uploads"""
+    try:
+        return process_corpus(uploads, job.update)
+    finally:
+        for upload in uploads:
+            upload.close()
+
+def _corpus_index(session_id: str, doc_session: Dict[str, Any]) -> CorpusIndex:
+    """The built index for a corpus session, rebuilt from its chunk rows if this worker lacks it"""
+    return corpus_indexes.get(session_id, lambda: CorpusIndex(doc_session['content'], doc_session['chunks']))
+
+# Returned by endpoints that would have to send a whole corpus to the model
+CORPUS_UNSUPPORTED = "Not available for multi-document sessions; ask questions with /api/ask"
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_request_profiler():
+    """Profile this request if it carries X-Profile and the admin profiling token"""
+    token = app.config['PROFILE_TOKEN']
+    if not token or 'X-Profile' not in request.headers:
+        return
+    mode = request.headers['X-Profile']
+    if mode not in PROFILE_MODES:
+        return jsonify({"error": f"X-Profile must be one of: {', '.join(PROFILE_MODES)}"}), 400
+    if not hmac.compare_digest(request.headers.get('X-Profile-Token', ''), token):
+        return jsonify({"error": "Invalid profiling token"}), 403
+    g.profiler = RequestProfiler(mode).start()
+
+@app.after_request
+def stop_request_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # Streamed bodies are produced after this point and are not covered
+        path = profiler.stop(app.config['PROFILE_DIR'], f"{request.method} {request.path}")
+        response.headers['X-Profile-Output'] = os.path.basename(path)
+    return response
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Label by route pattern rather than raw path to keep label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - started, endpoint, request.method, str(response.status_code)
+        )
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Gzip large JSON responses; streamed responses are left alone"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_BYTES']:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index():
     """Serve the main HTML file"""
@@ -46,7 +600,60 @@ def demo():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Backend is running"})
+    return jsonify({"status": "healthy", "message": "Backend is running", "assistant": ai_assistant.status()})
+
+@app.route('/api/warmup', methods=['POST'])
+def warmup():
+    """Load the configured assistant backend now instead of on the first request"""
+    try:
+        return jsonify(ai_assistant.warmup())
+    except Exception as e:
+        return jsonify({"error": f"Failed to load the {ai_assistant.backend} assistant: {str(e)}"}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Latency histograms and counters in Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Artifact cache hit/miss counters and size"""
+    return jsonify(artifact_cache.stats())
+
+@app.route('/api/admission-stats', methods=['GET'])
+def admission_stats():
+    """LLM calls in flight, queue depth and rejections, and the transport's retries and circuit state"""
+    return jsonify({**llm_admission.stats(), "transport": llm_transport.stats()})
+
+@app.route('/api/context-cache', methods=['GET'])
+def context_cache_stats():
+    """Context cache of a session and the prompt tokens it has saved"""
+    try:
+        session_id = request.args.get('session_id')
+        
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
+            return jsonify({"error": "Invalid session ID"}), 400
+        
+        context_cache = doc_session.get('context_cache')
+        if not context_cache:
+            return jsonify({"session_id": session_id, "cached": False})
+        
+        return jsonify({
+            "session_id": session_id,
+            "cached": True,
+            "expires_in": max(0, round(context_cache['expires'] - time.time())),
+            "document_tokens": context_cache['tokens'],
+            **ai_assistant.context_cache_usage(context_cache['name'])
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Failed to get context cache stats: {str(e)}"}), 500
+
+@app.route('/api/session-stats', methods=['GET'])
+def session_stats():
+    """Session count, memory held and eviction counters"""
+    return jsonify(document_sessions.stats())
 
 @app.route('/api/upload', methods=['POST'])
 def upload_document():
@@ -62,59 +669,178 @@ def upload_document():
         if not allowed_file(file.filename):
             return jsonify({"error": "File type not allowed"}), 400
         
-        # Generate session ID
-        session_id = str(uuid.uuid4())
+        if request.args.get('async') in ('1', 'true'):
+            # Hand the upload to a background job and let the client poll it
+            upload = UploadedFile.from_file_storage(file).detach()
+            try:
+                job = upload_jobs.submit(_run_upload_job, upload)
+            except QueueFullError as e:
+                upload.close()
+                return jsonify({"error": str(e)}), 503
+            return jsonify({
+                "job_id": job.id,
+                "status_url": f"/api/jobs/{job.id}",
+                "message": "Document queued for processing"
+            }), 202
         
-        # Create a temporary file-like object
-        import tempfile
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        file.save(temp_file.name)
-        temp_file.close()  # <-- Close the file before using or deleting it
+        with UploadedFile.from_file_storage(file) as upload:
+            result = process_document(upload)
+        result["message"] = "Document processed successfully"
+        return jsonify(result)
         
-        # Create a file-like object that mimics Streamlit's uploaded file
-        class FileWrapper:
-            def __init__(self, path, filename):
-                self.name = filename
-                self.type = file.content_type
-                self._path = path
-            def read(self):
-                with open(self._path, "rb") as f:
-                    return f.read()
+    except OverloadedError as e:
+        return _overloaded(e)
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/uploads', methods=['POST'])
+def create_chunked_upload():
+    """Start a chunked, resumable upload"""
+    try:
+        data = request.get_json()
+        filename = data.get('filename')
+        size = data.get('size')
         
-        file_wrapper = FileWrapper(temp_file.name, file.filename)
+        if not filename or not allowed_file(filename):
+            return jsonify({"error": "File type not allowed"}), 400
         
-        # Extract text
-        text_content = doc_processor.extract_text(file_wrapper)
+        if not isinstance(size, int):
+            return jsonify({"error": "File size in bytes is required"}), 400
         
-        # Generate summary
-        summary = ai_assistant.generate_summary(text_content)
+        content_type = EXTENSION_TYPES[filename.rsplit('.', 1)[1].lower()]
+        upload = chunked_uploads.create(filename, content_type, size)
+        upload["status_url"] = f"/api/uploads/{upload['upload_id']}"
+        return jsonify(upload), 201
         
-        # Store document session
-        document_sessions[session_id] = {
-            'filename': file.filename,
-            'content': text_content,
-            'summary': summary,
-            'conversation_history': [],
-            'challenge_questions': None,
-            'user_answers': [],
-            'evaluations': []
-        }
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Failed to start upload: {str(e)}"}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """Report which parts of a chunked upload have arrived, to resume it"""
+    try:
+        return jsonify(chunked_uploads.status(upload_id))
+    except KeyError:
+        return jsonify({"error": "Unknown upload ID"}), 404
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """Abandon a chunked upload and remove its parts"""
+    try:
+        chunked_uploads.abort(upload_id)
+        return jsonify({"message": "Upload aborted"})
+    except KeyError:
+        return jsonify({"error": "Unknown upload ID"}), 404
+
+@app.route('/api/uploads/<upload_id>/parts/<int:part_number>', methods=['PUT'])
+def upload_part(upload_id, part_number):
+    """Receive one part of a chunked upload as the raw request body"""
+    try:
+        return jsonify(chunked_uploads.write_part(
+            upload_id, part_number, request.stream, request.headers.get('X-Part-SHA256')
+        ))
+    except KeyError:
+        return jsonify({"error": "Unknown upload ID"}), 404
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Failed to store part: {str(e)}"}), 500
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """Process a chunked upload once all of its parts have arrived"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            upload = chunked_uploads.complete(upload_id, data.get('sha256'))
+        except KeyError:
+            return jsonify({"error": "Unknown upload ID"}), 404
         
-        # Clean up temp file
-        os.unlink(temp_file.name)
+        if request.args.get('async') in ('1', 'true'):
+            # Hand the upload to a background job and let the client poll it
+            try:
+                job = upload_jobs.submit(_run_upload_job, upload)
+            except QueueFullError as e:
+                upload.close()
+                return jsonify({"error": str(e)}), 503
+            return jsonify({
+                "job_id": job.id,
+                "status_url": f"/api/jobs/{job.id}",
+                "message": "Document queued for processing"
+            }), 202
         
-        return jsonify({
-            "session_id": session_id,
-            "filename": file.filename,
-            "summary": summary,
-            "message": "Document processed successfully"
-        })
+        with upload:
+            result = process_document(upload)
+        result["message"] = "Document processed successfully"
+        return jsonify(result)
         
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except OverloadedError as e:
+        return _overloaded(e)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/upload-corpus', methods=['POST'])
+def upload_corpus():
+    """Upload many related documents and process them into one corpus session"""
+    try:
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({"error": "No files part in the request"}), 400
+        
+        if len(files) > app.config['CORPUS_MAX_FILES']:
+            return jsonify({"error": f"At most {app.config['CORPUS_MAX_FILES']} files per corpus"}), 400
+        
+        for file in files:
+            if file.filename == '':
+                return jsonify({"error": "No selected file"}), 400
+            if not allowed_file(file.filename):
+                return jsonify({"error": f"File type not allowed: {file.filename}"}), 400
+        
+        if request.args.get('async') in ('1', 'true'):
+            # Hand the uploads to a background job and let the client poll it
+            uploads = [UploadedFile.from_file_storage(file).detach() for file in files]
+            try:
+                job = upload_jobs.submit(_run_corpus_job, uploads)
+            except QueueFullError as e:
+                for upload in uploads:
+                    upload.close()
+                return jsonify({"error": str(e)}), 503
+            return jsonify({
+                "job_id": job.id,
+                "status_url": f"/api/jobs/{job.id}",
+                "message": "Documents queued for processing"
+            }), 202
+        
+        uploads = [UploadedFile.from_file_storage(file) for file in files]
+        try:
+            result = process_corpus(uploads)
+        finally:
+            for upload in uploads:
+                upload.close()
+        result["message"] = "Documents processed successfully"
+        return jsonify(result)
+        
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report the stage and progress of an asynchronous upload"""
+    status = upload_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job ID"}), 404
+    return jsonify(status)
+
 @app.route('/api/ask', methods=['POST'])
 def ask_question():
     """Answer questions about the document"""
@@ -123,33 +849,185 @@ def ask_question():
         session_id = data.get('session_id')
         question = data.get('question')
         
-        if not session_id or session_id not in document_sessions:
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
             return jsonify({"error": "Invalid session ID"}), 400
         
         if not question:
             return jsonify({"error": "Question is required"}), 400
         
-        doc_session = document_sessions[session_id]
+        if doc_session.get('type') == 'corpus':
+            return jsonify(_ask_corpus(session_id, doc_session, question))
         
         # Get answer
+        document = _document_for(session_id, doc_session, question)
         answer, justification = ai_assistant.answer_question(
             question,
-            doc_session['content'],
+            document,
             doc_session['conversation_history']
         )
         
         # Add to conversation history
         doc_session['conversation_history'].append((question, answer, justification))
+        document_sessions[session_id] = doc_session
         
         return jsonify({
             "question": question,
             "answer": answer,
-            "justification": justification
+            "justification": justification,
+            "passages": _passage_offsets(document)
         })
         
+    except OverloadedError as e:
+        return _overloaded(e)
+    except Exception as e:
+        return jsonify({"error": f"Failed to answer question: {str(e)}"}), 500
+
+def _ask_corpus(session_id: str, doc_session: Dict[str, Any], question: str) -> Dict[str, Any]:
+    """Answer a question from the passages of a corpus that best match it, with citations"""
+    index = _corpus_index(session_id, doc_session)
+    with metrics.timed("retrieve"):
+        passages = index.search(question, app.config['CORPUS_TOP_K'])
+    documents = doc_session['documents']
+    sources = [
+        {"filename": documents[passage.document]['filename'], "page": passage.page, "text": index.passage_text(passage)}
+        for passage in passages
+    ]
+    
+    # Get answer
+    answer, justification, cited = ai_assistant.answer_from_sources(
+        question,
+        sources,
+        doc_session['conversation_history']
+    )
+    
+    # Add to conversation history
+    doc_session['conversation_history'].append((question, answer, justification))
+    document_sessions[session_id] = doc_session
+    
+    return {
+        "question": question,
+        "answer": answer,
+        "justification": justification,
+        "citations": [
+            {"source": i + 1, "filename": sources[i]['filename'], "page": sources[i]['page'], "excerpt": sources[i]['text']}
+            for i in cited
+        ]
+    }
+
+def _overloaded(e: OverloadedError):
+    """Refusal from LLM admission control, telling the client when to retry"""
+    return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status, {'Retry-After': str(e.retry_after)}
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/ask-stream', methods=['POST'])
+def ask_question_stream():
+    """Answer questions about the document, streaming the answer as server-sent events"""
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        question = data.get('question')
+        
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
+            return jsonify({"error": "Invalid session ID"}), 400
+        
+        if doc_session.get('type') == 'corpus':
+            return jsonify({"error": CORPUS_UNSUPPORTED}), 400
+        
+        if not question:
+            return jsonify({"error": "Question is required"}), 400
+        
+        # Refuse up front while the status code can still be sent
+        llm_admission.check()
+        
+        document = _document_for(session_id, doc_session, question)
+        
+        def generate():
+            try:
+                for event in ai_assistant.answer_question_stream(
+                    question,
+                    document,
+                    doc_session['conversation_history']
+                ):
+                    name = event.pop('event')
+                    if name == 'done':
+                        # Add to conversation history
+                        doc_session['conversation_history'].append(
+                            (question, event['answer'], event['justification'])
+                        )
+                        document_sessions[session_id] = doc_session
+                        event['question'] = question
+                        event['passages'] = _passage_offsets(document)
+                    yield _sse(name, event)
+            except OverloadedError as e:
+                yield _sse('error', {"error": str(e), "retry_after": e.retry_after})
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except OverloadedError as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({"error": f"Failed to answer question: {str(e)}"}), 500
 
+@app.route('/api/ask-batch', methods=['POST'])
+def ask_questions_batch():
+    """Answer a list of questions about the document in one request"""
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        questions = data.get('questions')
+        
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
+            return jsonify({"error": "Invalid session ID"}), 400
+        
+        if doc_session.get('type') == 'corpus':
+            return jsonify({"error": CORPUS_UNSUPPORTED}), 400
+        
+        if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+            return jsonify({"error": "Questions must be a non-empty list of strings"}), 400
+        
+        if len(questions) > app.config['ASK_BATCH_MAX_QUESTIONS']:
+            return jsonify({"error": f"At most {app.config['ASK_BATCH_MAX_QUESTIONS']} questions per batch"}), 400
+        
+        started = time.perf_counter()
+        # Large documents are answered from each question's own excerpts
+        excerpts = None
+        if _uses_retrieval(doc_session['content']):
+            excerpts = [_document_for(session_id, doc_session, question) for question in questions]
+        # Every question sees the history as it was before the batch
+        results = ai_assistant.answer_questions(
+            questions,
+            _full_document(session_id, doc_session),
+            doc_session['conversation_history'],
+            max_workers=app.config['ASK_BATCH_CONCURRENCY'],
+            excerpts=excerpts
+        )
+        
+        # Add to conversation history
+        doc_session['conversation_history'].extend(
+            (result['question'], result['answer'], result['justification']) for result in results
+        )
+        document_sessions[session_id] = doc_session
+        
+        return jsonify({
+            "answers": results,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+        
+    except OverloadedError as e:
+        return _overloaded(e)
+    except Exception as e:
+        return jsonify({"error": f"Failed to answer questions: {str(e)}"}), 500
+
 @app.route('/api/generate-questions', methods=['POST'])
 def generate_questions():
     """Generate challenge questions"""
@@ -157,23 +1035,30 @@ def generate_questions():
         data = request.get_json()
         session_id = data.get('session_id')
         
-        if not session_id or session_id not in document_sessions:
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
             return jsonify({"error": "Invalid session ID"}), 400
         
-        doc_session = document_sessions[session_id]
+        if doc_session.get('type') == 'corpus':
+            return jsonify({"error": CORPUS_UNSUPPORTED}), 400
         
-        # Generate questions
-        questions = ai_assistant.generate_challenge_questions(doc_session['content'])
+        # Use the questions generated after upload, or generate them now
+        questions = _claim_precomputed_questions(doc_session)
+        if questions is None:
+            questions = ai_assistant.generate_challenge_questions(_full_document(session_id, doc_session))
         
         # Store questions
         doc_session['challenge_questions'] = questions
         doc_session['user_answers'] = [""] * len(questions)
         doc_session['evaluations'] = [None] * len(questions)
+        document_sessions[session_id] = doc_session
         
         return jsonify({
             "questions": questions
         })
         
+    except OverloadedError as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({"error": f"Failed to generate questions: {str(e)}"}), 500
 
@@ -186,10 +1071,12 @@ def evaluate_answer():
         question_index = data.get('question_index')
         user_answer = data.get('answer')
         
-        if not session_id or session_id not in document_sessions:
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
             return jsonify({"error": "Invalid session ID"}), 400
         
-        doc_session = document_sessions[session_id]
+        if doc_session.get('type') == 'corpus':
+            return jsonify({"error": CORPUS_UNSUPPORTED}), 400
         
         if not doc_session['challenge_questions'] or question_index >= len(doc_session['challenge_questions']):
             return jsonify({"error": "Invalid question index"}), 400
@@ -200,38 +1087,114 @@ def evaluate_answer():
         evaluation = ai_assistant.evaluate_answer(
             question,
             user_answer,
-            doc_session['content']
+            _document_for(session_id, doc_session, f"{question} {user_answer or ''}")
         )
         
         # Store evaluation
         doc_session['evaluations'][question_index] = evaluation
         doc_session['user_answers'][question_index] = user_answer
+        document_sessions[session_id] = doc_session
         
         return jsonify({
             "evaluation": evaluation,
             "question_index": question_index
         })
         
+    except OverloadedError as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({"error": f"Failed to evaluate answer: {str(e)}"}), 500
 
+@app.route('/api/evaluate-all', methods=['POST'])
+def evaluate_all_answers():
+    """Evaluate the user's answers to all challenge questions at once"""
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        user_answers = data.get('answers')
+        
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
+            return jsonify({"error": "Invalid session ID"}), 400
+        
+        if doc_session.get('type') == 'corpus':
+            return jsonify({"error": CORPUS_UNSUPPORTED}), 400
+        
+        questions = doc_session['challenge_questions']
+        if not questions:
+            return jsonify({"error": "No challenge questions for this session"}), 400
+        
+        if not isinstance(user_answers, list) or len(user_answers) != len(questions):
+            return jsonify({"error": f"Expected a list of {len(questions)} answers"}), 400
+        
+        # Unanswered questions are left as they are
+        indices = [i for i, answer in enumerate(user_answers) if isinstance(answer, str) and answer.strip()]
+        if not indices:
+            return jsonify({"error": "At least one answer is required"}), 400
+        
+        # Evaluate answers
+        evaluations = ai_assistant.evaluate_answers(
+            [questions[i] for i in indices],
+            [user_answers[i] for i in indices],
+            _document_for(session_id, doc_session, " ".join(f"{questions[i]} {user_answers[i]}" for i in indices))
+        )
+        
+        # Store evaluations
+        for i, evaluation in zip(indices, evaluations):
+            doc_session['evaluations'][i] = evaluation
+            doc_session['user_answers'][i] = user_answers[i]
+        document_sessions[session_id] = doc_session
+        
+        return jsonify({
+            "evaluations": doc_session['evaluations']
+        })
+        
+    except OverloadedError as e:
+        return _overloaded(e)
+    except Exception as e:
+        return jsonify({"error": f"Failed to evaluate answers: {str(e)}"}), 500
+
 @app.route('/api/conversation-history', methods=['GET'])
 def get_conversation_history():
     """Get conversation history for a session"""
     try:
         session_id = request.args.get('session_id')
         
-        if not session_id or session_id not in document_sessions:
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
             return jsonify({"error": "Invalid session ID"}), 400
         
-        doc_session = document_sessions[session_id]
+        try:
+            since = int(request.args.get('since', 0))
+            limit = int(request.args.get('limit', app.config['HISTORY_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({"error": "since and limit must be integers"}), 400
+        if since < 0 or limit < 1:
+            return jsonify({"error": "since must be 0 or more and limit at least 1"}), 400
+        limit = min(limit, app.config['HISTORY_PAGE_SIZE'])
         
-        return jsonify({
-            "conversation_history": doc_session['conversation_history'],
-            "challenge_questions": doc_session['challenge_questions'],
-            "user_answers": doc_session['user_answers'],
-            "evaluations": doc_session['evaluations']
-        })
+        history = doc_session['conversation_history']
+        # History is append-only, so its length and the small challenge state identify this page
+        etag = hashlib.sha1(json.dumps([
+            since, limit, len(history),
+            doc_session['challenge_questions'], doc_session['user_answers'], doc_session['evaluations']
+        ]).encode("utf-8")).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            turns = history[since:since + limit]
+            response = jsonify({
+                "conversation_history": turns,
+                "cursor": since + len(turns),
+                "has_more": since + len(turns) < len(history),
+                "total_turns": len(history),
+                "challenge_questions": doc_session['challenge_questions'],
+                "user_answers": doc_session['user_answers'],
+                "evaluations": doc_session['evaluations']
+            })
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         return jsonify({"error": f"Failed to get conversation history: {str(e)}"}), 500
@@ -243,13 +1206,14 @@ def reset_session():
         data = request.get_json()
         session_id = data.get('session_id')
         
-        if not session_id or session_id not in document_sessions:
+        doc_session = document_sessions.get(session_id) if session_id else None
+        if doc_session is None:
             return jsonify({"error": "Invalid session ID"}), 400
         
-        doc_session = document_sessions[session_id]
         doc_session['challenge_questions'] = None
         doc_session['user_answers'] = []
         doc_session['evaluations'] = []
+        document_sessions[session_id] = doc_session
         
         return jsonify({"message": "Session reset successfully"})
         
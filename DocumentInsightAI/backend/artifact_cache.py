@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class ArtifactCache:
+    """Content-addressed store of artifacts derived from an uploaded document.
+
+    Entries are keyed by a hash of the uploaded bytes together with the AI
+    backend and model that produced them, and hold a JSON object of named
+    artifacts (extracted text, summary, ...). The store is a SQLite file, so
+    it survives restarts; the least recently used entries are evicted once
+    the stored artifacts exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " key TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed)")
+
+    @staticmethod
+    def key_for(content_hash: str, backend: str, model: str) -> str:
+        """Cache key for a document hash and the backend/model deriving artifacts from it"""
+        return hashlib.sha256(f"{content_hash}\0{backend}\0{model}".encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection, committing on success; usable from any request thread"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the artifacts stored under ``key``, or None on a miss"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE artifacts SET accessed = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, artifacts: Dict[str, Any]):
+        """Merge ``artifacts`` into the entry for ``key`` and enforce the size bound"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT data FROM artifacts WHERE key = ?", (key,)).fetchone()
+            merged = json.loads(row[0]) if row else {}
+            merged.update(artifacts)
+            data = json.dumps(merged)
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, data, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), time.time())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM artifacts ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since start-up and the current size of the store"""
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes
+        }
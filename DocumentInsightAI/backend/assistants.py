@@ -0,0 +1,187 @@
+import importlib
+import inspect
+import threading
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from admission import AdmissionController
+
+# Backend name -> (module, class). A backend's module, and the libraries it
+# pulls in (google-genai, openai, sklearn, torch, ...), is only imported once
+# that backend is chosen.
+BACKENDS = {
+    "gemini": ("gemini_ai_assistant", "GeminiAIAssistant"),
+    "openai": ("ai_assistant", "AIAssistant"),
+    "simple": ("simple_ai_assistant", "SimpleAIAssistant"),
+    "local": ("local_ai_assistant", "LocalAIAssistant"),
+}
+
+class CachedDocument(NamedTuple):
+    """A document held in a backend's context cache under ``name``.
+
+    The text is kept alongside so a call can still send the document inline
+    if the cache has expired or been deleted.
+    """
+    name: str
+    text: str
+
+
+class FallbackText(str):
+    """Text a backend wrote without its model because the model call failed.
+
+    It is still shown to the user but not cached, so the model is tried
+    again for the same document next time.
+    """
+
+
+# The model calls every backend provides
+_BASIC_METHODS = ("generate_summary", "answer_question", "generate_challenge_questions", "evaluate_answer")
+
+# Methods the app calls beyond the basic summary/answer/questions/evaluate set
+_EXTENDED_METHODS = ("answer_questions", "answer_question_stream", "answer_from_sources", "evaluate_answers")
+
+
+def load_backend(name: str) -> type:
+    """Import and return the assistant class registered under ``name``"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown assistant backend: {name} (choose from {', '.join(BACKENDS)})")
+    module_name, class_name = BACKENDS[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_assistant(name: str, **options) -> Any:
+    """Construct the named backend, passing only the options its constructor accepts.
+
+    Backends without the extended methods, or that do not take the
+    ``admission`` controller themselves, are wrapped in ``BasicAssistantAdapter``.
+    """
+    cls = load_backend(name)
+    parameters = inspect.signature(cls).parameters
+    assistant = cls(**{key: value for key, value in options.items() if key in parameters})
+    admission = options.get("admission") if "admission" not in parameters else None
+    if admission is None and all(hasattr(assistant, method) for method in _EXTENDED_METHODS):
+        return assistant
+    return BasicAssistantAdapter(assistant, admission)
+
+
+class BasicAssistantAdapter:
+    """Provides the extended assistant methods on top of a basic backend.
+
+    Batches and multi-answer evaluations run one call at a time, since local
+    models are not safe to call concurrently; streaming yields the whole
+    answer as a single event. With an ``admission`` controller, each basic
+    call holds one of its slots. Everything else is delegated unchanged.
+    """
+
+    def __init__(self, assistant: Any, admission: Optional[AdmissionController] = None):
+        self.assistant = assistant
+        self.admission = admission
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.assistant, name)
+        if name not in _BASIC_METHODS or self.admission is None:
+            return attribute
+
+        def admitted(*args, **kwargs):
+            with self.admission.slot():
+                return attribute(*args, **kwargs)
+        return admitted
+
+    def answer_questions(self, questions: List[str], document_content: str, conversation_history: List[Tuple],
+                         max_workers: int = 4, excerpts: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        results = []
+        for i, question in enumerate(questions):
+            started = time.perf_counter()
+            document = excerpts[i] if excerpts is not None else document_content
+            answer, justification = self.answer_question(question, document, conversation_history)
+            results.append({
+                "question": question,
+                "answer": answer,
+                "justification": justification,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+        return results
+
+    def answer_question_stream(self, question: str, document_content: str,
+                               conversation_history: List[Tuple]) -> Iterator[Dict[str, Any]]:
+        started = time.perf_counter()
+        answer, justification = self.answer_question(question, document_content, conversation_history)
+        ttft_ms = (time.perf_counter() - started) * 1000
+        yield {"event": "answer", "text": answer}
+        yield {"event": "justification", "text": justification}
+        yield {"event": "done", "answer": answer, "justification": justification, "ttft_ms": ttft_ms}
+
+    def answer_from_sources(self, question: str, sources: List[Dict[str, Any]],
+                            conversation_history: List[Tuple]) -> Tuple[str, str, List[int]]:
+        """Answer over the excerpts joined as one document; every excerpt is reported as cited"""
+        if not sources:
+            return "I could not find any passages in these documents related to your question.", "No matching passages.", []
+        # Paragraph breaks keep excerpts apart for backends that rank paragraphs
+        document_content = "\n\n".join(source['text'] for source in sources)
+        answer, justification = self.answer_question(question, document_content, conversation_history)
+        return answer, justification, list(range(len(sources)))
+
+    def evaluate_answers(self, questions: List[str], user_answers: List[str],
+                         document_content: str) -> List[Dict[str, Any]]:
+        return [
+            self.evaluate_answer(question, user_answer, document_content)
+            for question, user_answer in zip(questions, user_answers)
+        ]
+
+
+class LazyAssistant:
+    """Stands in for the configured assistant until it is first used or warmed up.
+
+    Attribute access constructs the backend on first use, so importing the
+    app does not import any backend library or load any model.
+    """
+
+    def __init__(self, backend: str, **options):
+        # Fail fast on a misconfigured name without importing anything
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown assistant backend: {backend} (choose from {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.warmup_seconds: Optional[float] = None
+        self._options = options
+        self._assistant = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._assistant is not None
+
+    def get(self) -> Any:
+        """Return the backend instance, constructing it on first call"""
+        if self._assistant is None:
+            with self._lock:
+                if self._assistant is None:
+                    started = time.perf_counter()
+                    assistant = create_assistant(self.backend, **self._options)
+                    if hasattr(assistant, "warmup"):
+                        assistant.warmup()
+                    self.warmup_seconds = time.perf_counter() - started
+                    self._assistant = assistant
+        return self._assistant
+
+    def warmup(self) -> Dict[str, Any]:
+        """Import and construct the backend now rather than on the first request"""
+        self.get()
+        return self.status()
+
+    @property
+    def cache_identity(self) -> Tuple[str, str]:
+        """(backend class, model name) identifying the artifacts this backend produces"""
+        assistant = self.get()
+        backend = getattr(assistant, "assistant", assistant)
+        model = getattr(backend, "model", "")
+        return type(backend).__name__, model if isinstance(model, str) else type(model).__name__
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "ready": self.ready,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from uploads import HASH_BLOCK_SIZE, UploadedFile
+
+# Request bodies are copied to disk in blocks of this many bytes
+PART_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for a chunked upload request that cannot be applied, e.g. a bad part or checksum"""
+
+
+class ChunkedUploadStore:
+    """Resumable uploads received as numbered parts and written straight to disk.
+
+    Each upload is a directory holding its metadata, one data file
+    preallocated at the full size, and a marker per received part recording
+    the part's SHA-256. Part N is written at its own offset in the data
+    file, so parts may arrive in any order or be re-sent after a dropped
+    connection, and completing the upload needs no assembly copy. The
+    directory is shared, so any worker process can receive any part.
+    """
+
+    def __init__(self, directory: str, part_size: int = 8 * 1024 * 1024,
+                 max_file_bytes: int = 2 * 1024 * 1024 * 1024, ttl: float = 24 * 3600):
+        self.directory = directory
+        self.part_size = part_size
+        self.max_file_bytes = max_file_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, upload_id: str, name: str = "") -> str:
+        # Upload IDs are generated here; reject anything that could escape the directory
+        if not upload_id.isalnum():
+            raise KeyError(upload_id)
+        return os.path.join(self.directory, upload_id, name)
+
+    def _meta(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(upload_id, "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+
+    def create(self, filename: str, content_type: str, size: int) -> Dict[str, Any]:
+        """Start an upload of ``size`` bytes and return its ID and part layout"""
+        if size <= 0:
+            raise UploadError("File size must be positive")
+        if size > self.max_file_bytes:
+            raise UploadError(f"File exceeds the {self.max_file_bytes} byte limit")
+        self.prune()
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._path(upload_id))
+        with open(self._path(upload_id, "data"), "wb") as f:
+            # Sparse on most filesystems; parts fill it in place
+            f.truncate(size)
+        meta = {
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "part_size": self.part_size,
+            "parts": -(-size // self.part_size),
+            "created": time.time()
+        }
+        with open(self._path(upload_id, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return {"upload_id": upload_id, **meta}
+
+    def write_part(self, upload_id: str, number: int, stream: BinaryIO,
+                   expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Copy part ``number`` (1-based) from ``stream`` into place and verify it"""
+        meta = self._meta(upload_id)
+        if not 1 <= number <= meta["parts"]:
+            raise UploadError(f"Part number must be between 1 and {meta['parts']}")
+        offset = (number - 1) * meta["part_size"]
+        expected_size = min(meta["part_size"], meta["size"] - offset)
+
+        # A re-sent part is not complete again until it has been fully written
+        marker = self._path(upload_id, f"part-{number}")
+        if os.path.exists(marker):
+            os.unlink(marker)
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(self._path(upload_id, "data"), "r+b") as f:
+            f.seek(offset)
+            for block in iter(lambda: stream.read(PART_BLOCK_SIZE), b""):
+                written += len(block)
+                if written > expected_size:
+                    raise UploadError(f"Part {number} must be {expected_size} bytes")
+                digest.update(block)
+                f.write(block)
+        if written != expected_size:
+            raise UploadError(f"Part {number} must be {expected_size} bytes, received {written}")
+        checksum = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != checksum:
+            raise UploadError(f"Part {number} checksum mismatch, please resend it")
+
+        partial = f"{marker}.{uuid.uuid4().hex}.partial"
+        with open(partial, "w") as f:
+            f.write(checksum)
+        os.replace(partial, marker)
+        return {"part": number, "size": written, "sha256": checksum}
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """Upload layout with the parts received so far and those still missing"""
+        meta = self._meta(upload_id)
+        received = self._received(upload_id)
+        return {
+            "upload_id": upload_id,
+            **meta,
+            "received": sorted(received),
+            "missing": [number for number in range(1, meta["parts"] + 1) if number not in received]
+        }
+
+    def _received(self, upload_id: str) -> Dict[int, str]:
+        received = {}
+        for name in os.listdir(self._path(upload_id)):
+            if name.startswith("part-") and name[5:].isdigit():
+                with open(self._path(upload_id, name)) as f:
+                    received[int(name[5:])] = f.read()
+        return received
+
+    def complete(self, upload_id: str, expected_sha256: Optional[str] = None) -> UploadedFile:
+        """Finish an upload whose parts have all arrived and hand over the assembled file.
+
+        The data file is moved out of the upload directory as-is and removed
+        when the returned handle is closed.
+        """
+        status = self.status(upload_id)
+        if status["missing"]:
+            raise UploadError(f"Missing parts: {', '.join(map(str, status['missing'][:20]))}")
+        data_path = self._path(upload_id, "data")
+        if expected_sha256:
+            digest = hashlib.sha256()
+            with open(data_path, "rb") as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                    digest.update(block)
+            if digest.hexdigest() != expected_sha256.lower():
+                raise UploadError("File checksum mismatch")
+        path = os.path.join(self.directory, f"complete-{upload_id}")
+        os.replace(data_path, path)
+        shutil.rmtree(self._path(upload_id), ignore_errors=True)
+        return UploadedFile.from_path(path, status["filename"], status["content_type"], owned=True)
+
+    def abort(self, upload_id: str):
+        self._meta(upload_id)
+        shutil.rmtree(self._path(upload_id), ignore_errors=True)
+
+    def prune(self) -> List[str]:
+        """Remove uploads started longer than ``ttl`` seconds ago"""
+        cutoff = time.time() - self.ttl
+        removed = []
+        for upload_id in os.listdir(self.directory):
+            try:
+                if self._meta(upload_id)["created"] < cutoff:
+                    shutil.rmtree(self._path(upload_id), ignore_errors=True)
+                    removed.append(upload_id)
+            except (KeyError, NotADirectoryError, ValueError):
+                continue
+        return removed
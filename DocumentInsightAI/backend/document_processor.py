@@ -1,18 +1,263 @@
 import PyPDF2
+import codecs
 import io
+import multiprocessing
 import re
-from typing import List
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import metrics
+
+# Encodings tried, in order, from the first non-ASCII byte of a TXT upload
+TXT_ENCODINGS = ['utf-8', 'latin1', 'cp1252']
+# First byte that ASCII does not cover
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+# TXT uploads are decoded in blocks of this many bytes
+TXT_BLOCK_SIZE = 64 * 1024
+
+# Sentence ending used to snap chunk boundaries
+_SENTENCE_END = re.compile(r'[.!?]\s+')
+# Approximate model tokens: words and individual punctuation marks
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+# Characters removed by preprocess_text
+_SPECIAL = r'[^\w\s.,!?;:()\-\'"]'
+# preprocess_text in one pass: whitespace other than a lone space, runs of
+# special characters, and periods that end up directly before a capital
+_NORMALIZE = re.compile(rf'(\s{{2,}}|[^\S ])|{_SPECIAL}+|(\.)(?={_SPECIAL}*[A-Z])')
+_NORMALIZE_REPLACEMENTS = {1: ' ', 2: '. '}
+# Trailing characters whose normalization can depend on the text that follows
+_NORMALIZE_HOLD = re.compile(rf'[\s.]|{_SPECIAL}')
+
+
+def _normalize(text: str) -> str:
+    return _NORMALIZE.sub(lambda match: _NORMALIZE_REPLACEMENTS.get(match.lastindex, ''), text)
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    """Start method for extraction workers: a fork server where available, otherwise spawn"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+class PageText(NamedTuple):
+    """Text of a single page and its character span in the extracted document"""
+    page_number: int
+    text: str
+    start: int
+    end: int
+
+
+def _extract_page_range(pdf_source: Union[str, bytes], start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) of a PDF given as a path or bytes; runs inside a worker process"""
+    with (open(pdf_source, "rb") if isinstance(pdf_source, str) else io.BytesIO(pdf_source)) as stream:
+        pdf_reader = PyPDF2.PdfReader(stream)
+        return [(pdf_reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+def _extract_pdf_pages(pdf_source: Union[str, bytes]) -> List[str]:
+    """Extract every page of a PDF given as a path or bytes; runs inside a worker process"""
+    try:
+        with (open(pdf_source, "rb") if isinstance(pdf_source, str) else io.BytesIO(pdf_source)) as stream:
+            pdf_reader = PyPDF2.PdfReader(stream)
+            texts = [(page.extract_text() or "") + "\n" for page in pdf_reader.pages]
+    except Exception as e:
+        raise Exception(f"Failed to read PDF: {str(e)}")
+    if all(text.isspace() for text in texts):
+        raise Exception("No text could be extracted from the PDF")
+    return texts
+
+
+def _group_pages(pieces: Iterable[Tuple[int, str]]) -> Iterator[PageText]:
+    """Join (page number, text) pieces into PageTexts with offsets into the joined text"""
+    offset = 0
+    for page_number, page_pieces in groupby(pieces, key=itemgetter(0)):
+        text = "".join(piece for _, piece in page_pieces)
+        if offset == 0:
+            text = text.lstrip()
+        yield PageText(page_number, text, offset, offset + len(text))
+        offset += len(text)
+
+
+class TextNormalizer:
+    """Incremental form of ``DocumentProcessor.preprocess_text``.
+
+    Text fed piece by piece comes out normalized exactly as if the pieces had
+    been joined and passed to ``preprocess_text``; only a short tail that the
+    next piece could still change is held back until ``flush``.
+    """
+    
+    def __init__(self):
+        self._pending = ""
+        self._started = False
+    
+    def feed(self, text: str) -> str:
+        """Normalize the next piece, returning the text that is now final"""
+        text = self._pending + text
+        split = len(text)
+        while split and _NORMALIZE_HOLD.match(text, split - 1):
+            split -= 1
+        self._pending = text[split:]
+        return self._emit(text[:split])
+    
+    def flush(self) -> str:
+        """Normalize whatever is held back at the end of the document"""
+        text, self._pending = self._pending, ""
+        return self._emit(text).rstrip()
+    
+    def _emit(self, text: str) -> str:
+        text = _normalize(text)
+        if not self._started:
+            # Leading whitespace of the document is dropped, like strip()
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+
+class ChunkTable:
+    """Compact table of chunk (start, end) character spans over a text.
+
+    Spans are kept in two integer arrays rather than as substring copies;
+    slice the original text with them when the chunk text is needed.
+    """
+    
+    __slots__ = ("starts", "ends")
+    
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+    
+    def append(self, start: int, end: int):
+        self.starts.append(start)
+        self.ends.append(end)
+    
+    def __len__(self) -> int:
+        return len(self.starts)
+    
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        return self.starts[index], self.ends[index]
+    
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.starts, self.ends)
+    
+    def texts(self, text: str) -> Iterator[str]:
+        """Lazily slice each chunk out of ``text``"""
+        for start, end in self:
+            yield text[start:end]
+
 
 class DocumentProcessor:
     """Handles document processing and text extraction"""
     
-    def extract_text(self, uploaded_file) -> str:
-        """Extract text from uploaded PDF or TXT file"""
+    def __init__(self, parallel_workers: int = 0, parallel_min_pages: int = 64):
+        """
+        parallel_workers: size of the process pool used for PDF page extraction
+            (0 or 1 keeps extraction in-process)
+        parallel_min_pages: PDFs with fewer pages are always extracted in-process
+        """
+        self.parallel_workers = parallel_workers
+        self.parallel_min_pages = parallel_min_pages
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+    
+    def extract_text(self, uploaded_file, progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Extract text from uploaded PDF or TXT file.
+
+        progress, if given, is called with (pages done, total pages) as each
+        page is extracted; a TXT file counts as one page.
+        """
+        pieces = list(self.extract_text_iter(uploaded_file, progress))
+        # Trim trailing whitespace per piece so the joined text is not copied again
+        while pieces and (not pieces[-1] or pieces[-1].isspace()):
+            pieces.pop()
+        if pieces:
+            pieces[-1] = pieces[-1].rstrip()
+        return "".join(pieces)
+    
+    def extract_text_iter(self, uploaded_file,
+                          progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        """Yield the document text piece by piece as pages or TXT blocks are decoded"""
+        started = False
+        for _, text in self._iter_pieces(uploaded_file, progress):
+            if not started:
+                # Leading whitespace of the document is dropped, like strip()
+                text = text.lstrip()
+                started = bool(text)
+            yield text
+    
+    def iter_pages(self, uploaded_file) -> Iterator[PageText]:
+        """Yield the text of each page with its page number and character offsets.
+
+        Offsets index into the text returned by ``extract_text``; joining the
+        page texts in order reproduces it (up to trailing whitespace). A TXT
+        file is a single page.
+        """
+        yield from _group_pages(self._iter_pieces(uploaded_file))
+    
+    def extract_pages_many(self, uploaded_files: Sequence,
+                           progress: Optional[Callable[[int, int], None]] = None) -> List[Union[List[PageText], Exception]]:
+        """Extract the pages of several documents at once.
+
+        With a process pool configured, each PDF is extracted whole by one
+        worker so many files run side by side; TXT files are decoded here
+        while the pool works. Returns one entry per file, in order: its pages
+        as ``iter_pages`` would yield them, or the exception that stopped its
+        extraction. progress, if given, is called with (files done, total files).
+        """
+        results: List[Union[List[PageText], Exception, None]] = [None] * len(uploaded_files)
+        done = 0
+        
+        def finish(index: int, result: Union[List[PageText], Exception]):
+            nonlocal done
+            results[index] = result
+            done += 1
+            if progress:
+                progress(done, len(uploaded_files))
+        
+        futures = {}
+        inline = []
+        for index, uploaded_file in enumerate(uploaded_files):
+            if self.parallel_workers > 1 and uploaded_file.type == "application/pdf":
+                # Workers open a disk-backed upload themselves; otherwise they get a copy
+                pdf_source = getattr(uploaded_file, "path", None)
+                if pdf_source is None:
+                    with self._open_stream(uploaded_file) as stream:
+                        pdf_source = stream.read()
+                futures[self._get_executor().submit(_extract_pdf_pages, pdf_source)] = index
+            else:
+                inline.append(index)
+        
+        for index in inline:
+            try:
+                finish(index, list(self.iter_pages(uploaded_files[index])))
+            except Exception as e:
+                finish(index, e)
+        for future in as_completed(futures):
+            try:
+                texts = future.result()
+                finish(futures[future], list(_group_pages(enumerate(texts, start=1))))
+            except Exception as e:
+                finish(futures[future], Exception(f"Failed to extract text from document: {str(e)}"))
+        return results
+    
+    def _iter_pieces(self, uploaded_file,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) pieces of the document in order"""
         try:
             if uploaded_file.type == "application/pdf":
-                return self._extract_pdf_text(uploaded_file)
+                for page_number, text in enumerate(self._iter_pdf_pages(uploaded_file, progress), start=1):
+                    yield page_number, text
             elif uploaded_file.type == "text/plain":
-                return self._extract_txt_text(uploaded_file)
+                for text in self._iter_txt_text(uploaded_file):
+                    yield 1, text
+                if progress:
+                    progress(1, 1)
             else:
                 raise ValueError(f"Unsupported file type: {uploaded_file.type}")
         except Exception as e:
@@ -20,77 +265,237 @@ class DocumentProcessor:
     
     def _extract_pdf_text(self, pdf_file) -> str:
         """Extract text from PDF file"""
-        text = ""
+        return "".join(self._iter_pdf_pages(pdf_file)).strip()
+    
+    def _iter_pdf_pages(self, pdf_file,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        """Yield the text of each PDF page, newline-terminated"""
+        has_text = False
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file.read()))
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            # Closing the generator early, or an error, releases the stream the reader is parsing
+            with self._open_stream(pdf_file) as stream:
+                pdf_reader = PyPDF2.PdfReader(stream)
+                num_pages = len(pdf_reader.pages)
+                
+                if self.parallel_workers > 1 and num_pages >= self.parallel_min_pages:
+                    # Workers open a disk-backed upload themselves; otherwise they get a copy
+                    pdf_source = getattr(pdf_file, "path", None)
+                    if pdf_source is None:
+                        stream.seek(0)
+                        pdf_source = stream.read()
+                    pages = self._iter_pdf_pages_parallel(pdf_source, num_pages)
+                else:
+                    pages = ((page.extract_text() or "") + "\n" for page in pdf_reader.pages)
+                
+                for page_number, text in enumerate(pages, start=1):
+                    has_text = has_text or not text.isspace()
+                    if progress:
+                        progress(page_number, num_pages)
+                    yield text
         except Exception as e:
             raise Exception(f"Failed to read PDF: {str(e)}")
         
-        if not text.strip():
+        if not has_text:
             raise Exception("No text could be extracted from the PDF")
-        
-        return text.strip()
+    
+    @contextmanager
+    def _open_stream(self, uploaded_file) -> Iterator[BinaryIO]:
+        """Get a seekable stream over the upload without copying it when possible.
+
+        The upload's own stream is left for its owner to close; a copy is
+        closed on exit.
+        """
+        if hasattr(uploaded_file, "open"):
+            yield uploaded_file.open()
+            return
+        with io.BytesIO(uploaded_file.read()) as stream:
+            yield stream
+    
+    def _iter_pdf_pages_parallel(self, pdf_source: Union[str, bytes], num_pages: int) -> Iterator[str]:
+        """Extract page ranges across the process pool, yielding pages in order"""
+        executor = self._get_executor()
+        # Each batch re-parses the PDF, so keep batches few but more than one
+        # per worker so a slow range does not leave the other cores idle
+        batch_size = max(1, -(-num_pages // (self.parallel_workers * 2)))
+        futures = [
+            executor.submit(_extract_page_range, pdf_source, start, min(start + batch_size, num_pages))
+            for start in range(0, num_pages, batch_size)
+        ]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the extraction process pool on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                # Not fork: by now the server is multi-threaded, and a forked worker can
+                # deadlock on a lock another thread held; workers only need this module
+                self._executor = ProcessPoolExecutor(max_workers=self.parallel_workers, mp_context=_pool_context())
+            return self._executor
+    
+    def shutdown(self):
+        """Release the extraction process pool"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
     
     def _extract_txt_text(self, txt_file) -> str:
         """Extract text from TXT file"""
+        return "".join(self._iter_txt_text(txt_file)).strip()
+    
+    def _iter_txt_text(self, txt_file) -> Iterator[str]:
+        """Decode a TXT file block by block.
+
+        ASCII is the same in every supported encoding, so the encoding is only
+        chosen at the first non-ASCII character: the first encoding in which
+        it is valid. Memory stays flat however large the file is; bytes later
+        found invalid in the chosen encoding are replaced rather than
+        restarting the decode.
+        """
         try:
-            # Try different encodings
-            encodings = ['utf-8', 'latin1', 'cp1252']
-            content = txt_file.read()
+            if hasattr(txt_file, "open"):
+                stream = txt_file.open()
+            else:
+                content = txt_file.read()
+                if isinstance(content, str):
+                    yield content
+                    return
+                stream = io.BytesIO(content)
             
-            for encoding in encodings:
-                try:
-                    if isinstance(content, bytes):
-                        text = content.decode(encoding)
+            decoder = None
+            # Bytes held back while the encoding is undecided: a possibly incomplete character
+            pending = b""
+            while True:
+                block = stream.read(TXT_BLOCK_SIZE)
+                final = not block
+                if decoder is not None:
+                    text = decoder.decode(block, final=final)
+                else:
+                    data = pending + block
+                    match = _NON_ASCII.search(data)
+                    if match is None:
+                        pending = b""
+                        text = data.decode("ascii")
                     else:
-                        text = content
-                    return text.strip()
-                except UnicodeDecodeError:
-                    continue
-            
-            raise Exception("Could not decode text file with any supported encoding")
+                        text, decoder, pending = self._choose_txt_decoder(data, match.start(), final)
+                if text:
+                    yield text
+                if final:
+                    break
         except Exception as e:
             raise Exception(f"Failed to read TXT file: {str(e)}")
     
+    def _choose_txt_decoder(self, data: bytes, first_non_ascii: int, final: bool) -> Tuple[str, Optional[Any], bytes]:
+        """Pick the encoding for a TXT file at its first non-ASCII byte.
+
+        Returns the decoded text, the incremental decoder to continue with
+        (None if the character at ``first_non_ascii`` is incomplete and the
+        choice has to wait for more bytes) and the bytes held back.
+        """
+        text, rest = data[:first_non_ascii].decode("ascii"), data[first_non_ascii:]
+        for encoding in TXT_ENCODINGS:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                decoded = decoder.decode(rest, final=final)
+            except UnicodeDecodeError as e:
+                if e.start == 0:
+                    # The first non-ASCII character is invalid here; try the next encoding from it
+                    continue
+                # Valid up to a later stray byte; keep this encoding and replace that byte
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                decoded = decoder.decode(rest, final=final)
+            if not decoded:
+                # Only the start of a multi-byte character so far
+                return text, None, rest
+            decoder.errors = "replace"
+            return text + decoded, decoder, b""
+        raise Exception("Could not decode text file with any supported encoding")
+    
     def chunk_text(self, text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
         """Split text into overlapping chunks for better processing"""
         if len(text) <= chunk_size:
             return [text]
+        return list(self.chunk_spans(text, chunk_size, overlap).texts(text))
+    
+    def chunk_spans(self, text: str, chunk_size: int = 2000, overlap: int = 200,
+                    by_tokens: bool = False) -> ChunkTable:
+        """Compute overlapping chunk spans in a single pass over the text.
+
+        Chunks end at the last sentence boundary near the size limit when there
+        is one, and are stripped of surrounding whitespace. With ``by_tokens``,
+        ``chunk_size`` and ``overlap`` count approximate model tokens instead of
+        characters.
+        """
+        with metrics.timed("chunk"):
+            return self._chunk_spans(text, chunk_size, overlap, by_tokens)
+    
+    def _chunk_spans(self, text: str, chunk_size: int, overlap: int, by_tokens: bool) -> ChunkTable:
+        # Find every sentence boundary once: punctuation offsets and match ends
+        boundaries, boundary_ends = array("q"), array("q")
+        for match in _SENTENCE_END.finditer(text):
+            boundaries.append(match.start())
+            boundary_ends.append(match.end())
         
-        chunks = []
-        start = 0
+        if by_tokens:
+            token_starts = array("q", (match.start() for match in _TOKEN.finditer(text)))
+            num_units = len(token_starts)
+            to_offset = lambda unit: token_starts[unit] if unit < num_units else len(text)
+            to_unit = lambda offset: bisect_left(token_starts, offset)
+            # Snap to a sentence end within the last tenth of the token budget
+            snap_window = max(1, chunk_size // 10)
+        else:
+            num_units = len(text)
+            to_offset = to_unit = lambda value: value
+            snap_window = min(200, chunk_size)
         
-        while start < len(text):
-            end = start + chunk_size
+        table = ChunkTable()
+        start_unit = 0
+        while start_unit < num_units:
+            end_unit = start_unit + chunk_size
+            start = to_offset(start_unit)
+            end = to_offset(end_unit)
             
-            # Try to end at a sentence boundary
-            if end < len(text):
-                # Look for sentence endings within the last 200 characters
-                sentence_ends = [m.end() for m in re.finditer(r'[.!?]\s+', text[end-200:end])]
-                if sentence_ends:
-                    end = start + chunk_size - 200 + sentence_ends[-1]
+            if end_unit < num_units:
+                window_start = to_offset(max(start_unit, end_unit - snap_window))
+                # Last sentence whose punctuation and first trailing space fall in the window
+                index = bisect_left(boundaries, end - 1) - 1
+                if index >= 0 and boundaries[index] >= window_start:
+                    end = min(boundary_ends[index], end)
+                    end_unit = to_unit(end)
             
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+            chunk_start, chunk_end = start, min(end, len(text))
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_start < chunk_end:
+                table.append(chunk_start, chunk_end)
             
-            start = end - overlap
-            if start >= len(text):
+            if end >= len(text):
                 break
+            start_unit = max(end_unit - overlap, start_unit + 1)
         
-        return chunks
+        return table
     
     def preprocess_text(self, text: str) -> str:
         """Clean and preprocess text for better AI processing"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove special characters that might interfere with processing
-        text = re.sub(r'[^\w\s.,!?;:()\-\'"]+', '', text)
-        
-        # Ensure proper sentence spacing
-        text = re.sub(r'\.(?=[A-Z])', '. ', text)
-        
-        return text.strip()
\ No newline at end of file
+        # Collapse whitespace, remove special characters that might interfere
+        # with processing and ensure sentence spacing, all in one pass
+        with metrics.timed("preprocess"):
+            return _normalize(text).strip()
+    
+    def preprocess_iter(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Preprocess a stream of text pieces, e.g. from extract_text_iter"""
+        normalizer = TextNormalizer()
+        for piece in pieces:
+            text = normalizer.feed(piece)
+            if text:
+                yield text
+        tail = normalizer.flush()
+        if tail:
+            yield tail
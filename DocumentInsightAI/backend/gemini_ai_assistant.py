@@ -1,42 +1,160 @@
 import os
 import json
 import logging
-from typing import List, Tuple, Dict, Any
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, Iterator, List, Optional, Tuple, Dict, Any, Union
 from google import genai
 from google.genai import types
 from pydantic import BaseModel
+import metrics
+from admission import AdmissionController, OverloadedError
+from assistants import CachedDocument, FallbackText
+from llm_transport import LLMTransport
+from summarizer import MapReduceSummarizer
+
+# Source citations such as [2] or [1, 3] in a corpus answer
+_CITATION = re.compile(r'\[(\d+(?:\s*,\s*\d+)*)\]')
+
+# A document is passed as its full text, as retrieved excerpts (dicts with
+# the "start" and "end" character offsets and "text" of each), or as a
+# handle to a context cache already holding its full text
+Document = Union[str, List[Dict[str, Any]], CachedDocument]
+
+# Context caches whose hit counts are remembered, most recently used kept
+_CACHE_USAGE_ENTRIES = 1024
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class _AnswerStreamParser:
+    """Splits a streamed "Answer: ... Justification: ..." response into section deltas.
+
+    Follows the line rules of ``GeminiAIAssistant._parse_answer_response``:
+    a marker at the start of a line switches section and continuation lines
+    are joined with a space. Text is released as soon as the current line can
+    no longer turn out to be a marker; trailing whitespace is held back.
+    """
+    
+    MARKERS = (("Answer:", "answer"), ("Justification:", "justification"))
+    
+    def __init__(self):
+        self.section = None
+        self._section_started = False
+        self._line = ""
+        self._line_section = None
+        self._emitted = 0
+        self._join = False
+    
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of the response and return (section, text) deltas"""
+        events = []
+        pieces = text.split("\n")
+        for i, piece in enumerate(pieces):
+            self._line += piece
+            line_done = i < len(pieces) - 1
+            self._advance(events, line_done)
+            if line_done:
+                self._line, self._line_section, self._emitted = "", None, 0
+        return events
+    
+    def _advance(self, events: List[Tuple[str, str]], line_done: bool):
+        if self._line_section is None:
+            stripped = self._line.lstrip()
+            if not line_done and any(marker.startswith(stripped) for marker, _ in self.MARKERS):
+                # Could still become a marker once more text arrives
+                return
+            for marker, section in self.MARKERS:
+                if stripped.startswith(marker):
+                    self.section = self._line_section = section
+                    self._section_started = False
+                    self._emitted = len(self._line) - len(stripped) + len(marker)
+                    self._join = False
+                    break
+            else:
+                if self.section is None:
+                    # Text before the first marker is not part of either section
+                    self._line_section = ""
+                    return
+                self._line_section = self.section
+                self._emitted = len(self._line) - len(stripped)
+                self._join = True
+        if not self._line_section:
+            return
+        
+        content_end = len(self._line.rstrip())
+        pending = self._line[self._emitted:content_end]
+        if not self._section_started:
+            pending = pending.lstrip()
+        if not pending:
+            return
+        if self._join and self._section_started:
+            pending = " " + pending
+        events.append((self._line_section, pending))
+        self._section_started = True
+        self._join = False
+        self._emitted = content_end
+
+
 class GeminiAIAssistant:
     """Handles AI interactions using Google's Gemini API"""
     
-    def __init__(self):
-        # Initialize Gemini client
+    # Answers and evaluations accept retrieved excerpts in place of the full text
+    supports_excerpts = True
+    
+    def __init__(self, admission: Optional[AdmissionController] = None, client: Optional[Any] = None,
+                 summary_chunk_tokens: int = 16000, summary_workers: int = 4,
+                 transport: Optional[LLMTransport] = None, base_url: Optional[str] = None):
+        # Every model call takes a slot from the admission controller, if one is given
+        self.admission = admission
+        
+        # Calls go through the async client with deadlines, retries and a circuit breaker
+        self.transport = transport if transport is not None else LLMTransport("gemini")
+        
+        # Documents longer than one chunk are summarized part by part, in parallel
+        self.summarizer = MapReduceSummarizer(
+            lambda prompt: self._generate("summary", prompt).text or "",
+            chunk_tokens=summary_chunk_tokens,
+            max_workers=summary_workers
+        )
+        
+        # Context cache name -> hits and tokens read from the cache instead of re-sent
+        self._cache_usage: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Initialize Gemini client; tests and benchmarks may pass a stand-in or point it at a fake server
         api_key ="Place Api Key here"  # Replace with your real key
-        self.client = genai.Client(api_key=api_key)
+        self.client = client if client is not None else genai.Client(
+            api_key=api_key, http_options=types.HttpOptions(base_url=base_url) if base_url else None
+        )
+        self.model = "gemini-2.0-flash-exp"
         logger.info("✅ Gemini AI Assistant initialized with hardcoded API key!")
 
         
         # self.client = genai.Client(api_key=api_key)
         # logger.info("Gemini AI Assistant initialized successfully!")
     
-    def generate_summary(self, document_content: str) -> str:
+    def generate_summary(self, document_content: Union[str, CachedDocument]) -> str:
         """Generate a concise summary of the document (≤150 words)"""
+        text = document_content.text if isinstance(document_content, CachedDocument) else document_content
         try:
-            prompt = f"""Please provide a concise summary of the following document in exactly 150 words or less. 
+            if self.summarizer.needed(text):
+                return self.summarizer.summarize(text, 150) or "Unable to generate summary"
+            
+            def prompt(document: Union[str, CachedDocument]) -> str:
+                return f"""Please provide a concise summary of the following document in exactly 150 words or less. 
 Focus on the main points, key findings, and important conclusions:
 
-{document_content}
+{self._document_section(document)}
 
 Summary:"""
 
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
-            )
+            response = self._generate_about("summary", document_content, prompt)
 
             # Try to get the text from the response
             if hasattr(response, "text"):
@@ -48,53 +166,364 @@ Summary:"""
             else:
                 return str(response)
             
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error generating summary: {e}")
+            metrics.FALLBACKS.inc("summary")
             # Fallback to first 150 words
-            words = document_content.split()
-            return " ".join(words[:150]) + "..." if len(words) > 150 else document_content
+            words = text.split()
+            return FallbackText(" ".join(words[:150]) + "..." if len(words) > 150 else text)
     
-    def answer_question(self, question: str, document_content: str, conversation_history: List[Tuple]) -> Tuple[str, str]:
+    def answer_question(self, question: str, document_content: Document, conversation_history: List[Tuple]) -> Tuple[str, str]:
         """Answer a question based on the document content with justification"""
+        context = self._build_conversation_context(conversation_history)
+        return self._answer(question, document_content, context)
+    
+    def answer_questions(self, questions: List[str], document_content: Document, conversation_history: List[Tuple],
+                         max_workers: int = 4, excerpts: Optional[List[Document]] = None) -> List[Dict[str, Any]]:
+        """Answer several questions about the same document concurrently.
+
+        The conversation context is built once and every prompt shares the
+        same document prefix, unless ``excerpts`` gives each question its own
+        retrieved excerpts. Returns one dict per question, in order, with its
+        answer, justification and the time its call took.
+        """
+        context = self._build_conversation_context(conversation_history)
+        documents = dict(zip(questions, excerpts)) if excerpts is not None else {}
+        
+        def answer(question: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            answer, justification = self._answer(question, documents.get(question, document_content), context)
+            return {
+                "question": question,
+                "answer": answer,
+                "justification": justification,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(questions)))) as executor:
+            return list(executor.map(answer, questions))
+    
+    def _answer(self, question: str, document_content: Document, context: str) -> Tuple[str, str]:
+        """Answer one question given an already built conversation context"""
         try:
-            # Build conversation context
-            context = self._build_conversation_context(conversation_history)
-            
-            prompt = f"""Based on the following document, please answer the question. Provide a clear, accurate answer followed by a brief justification.
+            response = self._generate_about(
+                "answer", document_content, lambda document: self._answer_prompt(question, document, context)
+            )
 
-Document:
-{document_content}
+            if response.text:
+                with metrics.timed("parse"):
+                    return self._parse_answer_response(response.text)
+            else:
+                metrics.FALLBACKS.inc("answer")
+                return "I found relevant information but couldn't generate a complete answer.", "Based on document analysis."
+                
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            metrics.FALLBACKS.inc("answer")
+            return "I encountered an error while processing your question.", "Error in AI processing."
+    
+    def answer_from_sources(self, question: str, sources: List[Dict[str, Any]],
+                            conversation_history: List[Tuple]) -> Tuple[str, str, List[int]]:
+        """Answer a question from retrieved excerpts of several documents.
+
+        ``sources`` are dicts with the ``filename``, ``page`` and ``text`` of
+        each excerpt. Only the excerpts are sent, never whole documents.
+        Returns the answer, its justification and the 0-based indices of the
+        sources the model cited.
+        """
+        if not sources:
+            metrics.FALLBACKS.inc("answer")
+            return "I could not find any passages in these documents related to your question.", "No matching passages.", []
+        
+        excerpts = "\n\n".join(
+            f"[{i + 1}] {source['filename']}, page {source['page']}:\n{source['text']}"
+            for i, source in enumerate(sources)
+        )
+        context = self._build_conversation_context(conversation_history)
+        prompt = f"""Based on the following numbered excerpts from a collection of documents, please answer the question. Provide a clear, accurate answer followed by a brief justification.
+Cite the excerpts you rely on by their number in square brackets, e.g. [2] or [1, 3].
+
+Excerpts:
+{excerpts}
 
 {context}
 
 Question: {question}
 
 Please provide your response in the following format:
-Answer: [Your detailed answer here]
-Justification: [Brief explanation of how you found this answer in the document]"""
+Answer: [Your detailed answer here, with citations]
+Justification: [Brief explanation of which excerpts support this answer]"""
+        
+        try:
+            response = self._generate("answer_corpus", prompt)
+            
+            if response.text:
+                with metrics.timed("parse"):
+                    answer, justification = self._parse_answer_response(response.text)
+                    cited = sorted({
+                        int(number) - 1
+                        for match in _CITATION.finditer(f"{answer} {justification}")
+                        for number in match.group(1).split(",")
+                        if 0 < int(number) <= len(sources)
+                    })
+                return answer, justification, cited
+            else:
+                metrics.FALLBACKS.inc("answer")
+                return "I found relevant information but couldn't generate a complete answer.", "Based on document analysis.", []
+                
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error answering corpus question: {e}")
+            metrics.FALLBACKS.inc("answer")
+            return "I encountered an error while processing your question.", "Error in AI processing.", []
+    
+    def answer_question_stream(self, question: str, document_content: Document,
+                               conversation_history: List[Tuple]) -> Iterator[Dict[str, Any]]:
+        """Stream an answer as it is generated.
 
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
+        Yields ``{"event": "answer" | "justification", "text": delta}`` events
+        as each section grows, then a final ``{"event": "done", "answer": ...,
+        "justification": ..., "ttft_ms": ...}`` holding the same parse that
+        ``answer_question`` would return and the time to the first token.
+        """
+        started = time.perf_counter()
+        ttft_ms = None
+        parser = _AnswerStreamParser()
+        chunks = []
+        context = self._build_conversation_context(conversation_history)
+        try:
+            with self._admitted():
+                stream = self._stream_about(
+                    document_content, lambda document: self._answer_prompt(question, document, context)
+                )
+                usage = None
+                for chunk in stream:
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if not chunk.text:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        metrics.LLM_TIME_TO_FIRST_TOKEN.observe(ttft_ms / 1000)
+                    chunks.append(chunk.text)
+                    for section, text in parser.feed(chunk.text):
+                        yield {"event": section, "text": text}
+            
+            metrics.STAGE_LATENCY.observe(time.perf_counter() - started, "llm")
+            self._record_usage(
+                "answer_stream", usage,
+                document_content.name if isinstance(document_content, CachedDocument) else None
             )
-
-            if response.text:
-                return self._parse_answer_response(response.text)
+            
+            if chunks:
+                with metrics.timed("parse"):
+                    answer, justification = self._parse_answer_response("".join(chunks))
             else:
-                return "I found relevant information but couldn't generate a complete answer.", "Based on document analysis."
+                metrics.FALLBACKS.inc("answer")
+                answer, justification = "I found relevant information but couldn't generate a complete answer.", "Based on document analysis."
                 
+        except OverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"Error answering question: {e}")
-            return "I encountered an error while processing your question.", "Error in AI processing."
+            logger.error(f"Error streaming answer: {e}")
+            metrics.LLM_ERRORS.inc("answer_stream")
+            metrics.FALLBACKS.inc("answer")
+            answer, justification = "I encountered an error while processing your question.", "Error in AI processing."
+        
+        if ttft_ms is not None:
+            logger.info(f"Answer stream time to first token: {ttft_ms:.0f} ms")
+        yield {"event": "done", "answer": answer, "justification": justification, "ttft_ms": ttft_ms}
+    
+    def _generate(self, operation: str, contents: str, config: Optional[types.GenerateContentConfig] = None):
+        """Call the model, recording latency, token usage and errors under ``operation``"""
+        with self._admitted():
+            try:
+                with metrics.timed("llm"):
+                    response = self.transport.run(operation, lambda: self.client.aio.models.generate_content(
+                        model=self.model, contents=contents, config=config
+                    ))
+            except Exception:
+                metrics.LLM_ERRORS.inc(operation)
+                raise
+        self._record_usage(operation, getattr(response, "usage_metadata", None), getattr(config, "cached_content", None))
+        return response
+    
+    def _generate_about(self, operation: str, document_content: Document, prompt: Callable[[Document], str],
+                        config: Optional[types.GenerateContentConfig] = None):
+        """Call the model with a prompt built around a document, through its context cache if it has one.
+
+        If the cached call is rejected, e.g. because the cache has expired, the
+        call is repeated with the document sent inline. Failures the transport
+        already retried are raised as they are.
+        """
+        if isinstance(document_content, CachedDocument):
+            try:
+                return self._generate(operation, prompt(document_content), self._cache_config(document_content.name, config))
+            except OverloadedError:
+                raise
+            except Exception as e:
+                if self.transport.retryable(e):
+                    raise
+                self._cache_unusable(document_content, e)
+                document_content = document_content.text
+        return self._generate(operation, prompt(document_content), config)
+    
+    def _stream_about(self, document_content: Document, prompt: Callable[[Document], str]) -> Iterator[Any]:
+        """Stream response chunks for a prompt built around a document, through its context cache if it has one"""
+        if isinstance(document_content, CachedDocument):
+            streamed = False
+            try:
+                for chunk in self._stream(prompt(document_content), self._cache_config(document_content.name)):
+                    streamed = True
+                    yield chunk
+                return
+            except OverloadedError:
+                raise
+            except Exception as e:
+                # Only a call refused before any output can be repeated inline
+                if streamed or self.transport.retryable(e):
+                    raise
+                self._cache_unusable(document_content, e)
+                document_content = document_content.text
+        yield from self._stream(prompt(document_content))
+    
+    def _stream(self, contents: str, config: Optional[types.GenerateContentConfig] = None) -> Iterator[Any]:
+        return self.transport.stream("answer_stream", lambda: self.client.aio.models.generate_content_stream(
+            model=self.model, contents=contents, config=config
+        ))
+    
+    def _cache_config(self, name: str, config: Optional[types.GenerateContentConfig] = None) -> types.GenerateContentConfig:
+        """A generation config reading the document from the context cache ``name``"""
+        if config is None:
+            return types.GenerateContentConfig(cached_content=name)
+        return config.model_copy(update={"cached_content": name})
+    
+    def _cache_unusable(self, document_content: CachedDocument, error: Exception):
+        logger.warning(f"Context cache {document_content.name} could not be used, sending the document inline: {error}")
+        metrics.CONTEXT_CACHE.inc("unusable")
+    
+    def create_context_cache(self, document_content: str, ttl: float) -> Optional[Dict[str, Any]]:
+        """Put a document in a Gemini context cache that expires after ``ttl`` seconds.
+
+        Returns the cache's ``name``, ``expires`` time and size in ``tokens``,
+        or None if the cache could not be created, e.g. because the document
+        is below the model's minimum cacheable size.
+        """
+        try:
+            with metrics.timed("cache"):
+                cache = self.transport.run("cache", lambda: self.client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[types.Content(role="user", parts=[types.Part(text=f"Document:\n{document_content}")])],
+                        ttl=f"{int(ttl)}s"
+                    )
+                ))
+        except Exception as e:
+            logger.warning(f"Could not create a context cache, the document will be sent inline: {e}")
+            metrics.CONTEXT_CACHE.inc("create_failed")
+            return None
+        metrics.CONTEXT_CACHE.inc("created")
+        usage = getattr(cache, "usage_metadata", None)
+        return {"name": cache.name, "expires": time.time() + ttl, "tokens": getattr(usage, "total_token_count", None)}
+    
+    def extend_context_cache(self, name: str, ttl: float) -> Optional[float]:
+        """Push a context cache's expiry to ``ttl`` seconds from now; returns the new expiry, or None if it is gone.
+
+        Raises if the upstream is unavailable, since the cache may still exist.
+        """
+        try:
+            self.transport.run("cache", lambda: self.client.aio.caches.update(
+                name=name, config=types.UpdateCachedContentConfig(ttl=f"{int(ttl)}s")
+            ))
+        except OverloadedError:
+            raise
+        except Exception as e:
+            if self.transport.retryable(e):
+                raise
+            logger.warning(f"Could not extend context cache {name}: {e}")
+            metrics.CONTEXT_CACHE.inc("expired")
+            return None
+        metrics.CONTEXT_CACHE.inc("extended")
+        return time.time() + ttl
+    
+    def delete_context_cache(self, name: str):
+        """Delete a context cache whose session has ended, rather than leave it billed until it expires"""
+        try:
+            self.transport.run("cache", lambda: self.client.aio.caches.delete(name=name))
+        except Exception as e:
+            logger.warning(f"Could not delete context cache {name}, it will expire on its own: {e}")
+            return
+        metrics.CONTEXT_CACHE.inc("deleted")
+        with self._cache_lock:
+            self._cache_usage.pop(name, None)
+    
+    def context_cache_usage(self, name: str) -> Dict[str, int]:
+        """Calls served from a context cache by this process and the prompt tokens they did not re-send"""
+        with self._cache_lock:
+            return dict(self._cache_usage.get(name, {"hits": 0, "tokens_saved": 0}))
+    
+    def _admitted(self):
+        """Context holding an admission slot for one model call; raises OverloadedError when refused"""
+        return self.admission.slot() if self.admission is not None else nullcontext()
+    
+    def _record_usage(self, operation: str, usage, cache: Optional[str] = None):
+        """Count the prompt, completion and cached tokens reported for a call made with context cache ``cache``"""
+        if usage is None:
+            return
+        for kind, field in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count"),
+                            ("cached", "cached_content_token_count")):
+            count = getattr(usage, field, None)
+            if count:
+                metrics.LLM_TOKENS.inc(operation, kind, amount=count)
+        cached = getattr(usage, "cached_content_token_count", None)
+        if cache and cached:
+            with self._cache_lock:
+                counts = self._cache_usage.setdefault(cache, {"hits": 0, "tokens_saved": 0})
+                counts["hits"] += 1
+                counts["tokens_saved"] += cached
+                self._cache_usage.move_to_end(cache)
+                while len(self._cache_usage) > _CACHE_USAGE_ENTRIES:
+                    self._cache_usage.popitem(last=False)
+    
+    def _answer_prompt(self, question: str, document_content: Document, context: str) -> str:
+        """Build the question-answering prompt around a conversation context"""
+        return f"""Based on the following document, please answer the question. Provide a clear, accurate answer followed by a brief justification.
+
+{self._document_section(document_content)}
+
+{context}
+
+Question: {question}
+
+Please provide your response in the following format:
+Answer: [Your detailed answer here]
+Justification: [Brief explanation of how you found this answer in the document]"""
+    
+    def _document_section(self, document_content: Document) -> str:
+        """The document part of a prompt: the full text, a pointer to the cached text, or numbered excerpts with their offsets"""
+        if isinstance(document_content, str):
+            return f"Document:\n{document_content}"
+        if isinstance(document_content, CachedDocument):
+            return "Document: the document given at the start of this conversation."
+        excerpts = "\n\n".join(
+            f"[{i + 1}] (characters {excerpt['start']}-{excerpt['end']}):\n{excerpt['text']}"
+            for i, excerpt in enumerate(document_content)
+        )
+        return f"""Relevant excerpts from the document, with their character offsets (the rest of the document is omitted; cite excerpts by number in the justification):
+{excerpts}"""
     
-    def generate_challenge_questions(self, document_content: str) -> List[str]:
+    def generate_challenge_questions(self, document_content: Union[str, CachedDocument]) -> List[str]:
         """Generate 3 logic-based questions for the Challenge Me mode"""
         try:
-            prompt = f"""Based on the following document, generate exactly 3 challenging questions that test comprehension, analysis, and critical thinking. 
+            def prompt(document: Union[str, CachedDocument]) -> str:
+                return f"""Based on the following document, generate exactly 3 challenging questions that test comprehension, analysis, and critical thinking. 
 The questions should require understanding of the document content and logical reasoning.
 
-Document:
-{document_content}
+{self._document_section(document)}
 
 Please generate 3 questions that:
 1. Test understanding of key concepts
@@ -106,10 +535,7 @@ Format your response as a numbered list:
 2. [Question 2]
 3. [Question 3]"""
 
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
-            )
+            response = self._generate_about("questions", document_content, prompt)
 
             if response.text:
                 # Parse the numbered list
@@ -134,18 +560,20 @@ Format your response as a numbered list:
             else:
                 return self._fallback_questions()
                 
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error generating challenge questions: {e}")
             return self._fallback_questions()
     
-    def evaluate_answer(self, question: str, user_answer: str, document_content: str) -> Dict[str, Any]:
+    def evaluate_answer(self, question: str, user_answer: str, document_content: Document) -> Dict[str, Any]:
         """Evaluate user's answer to a challenge question"""
         try:
-            prompt = f"""Evaluate the following answer to a question based on the provided document. 
+            def prompt(document: Document) -> str:
+                return f"""Evaluate the following answer to a question based on the provided document. 
 Provide a score from 1-10, constructive feedback, and justification.
 
-Document:
-{document_content}
+{self._document_section(document)}
 
 Question: {question}
 
@@ -158,31 +586,84 @@ Please evaluate the answer and provide your response in the following JSON forma
     "justification": "[Explanation of how you evaluated the answer]"
 }}"""
 
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
+            response = self._generate_about(
+                "evaluation", document_content, prompt,
+                types.GenerateContentConfig(response_mime_type="application/json")
             )
 
             if response.text:
                 try:
-                    result = json.loads(response.text)
-                    return {
-                        "score": max(1, min(10, int(result.get("score", 5)))),
-                        "feedback": result.get("feedback", "Good effort on your answer."),
-                        "justification": result.get("justification", "Evaluation based on document content analysis.")
-                    }
+                    with metrics.timed("parse"):
+                        return self._evaluation_from_result(json.loads(response.text))
                 except json.JSONDecodeError:
                     return self._fallback_evaluation(user_answer)
             else:
                 return self._fallback_evaluation(user_answer)
                 
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error evaluating answer: {e}")
             return self._fallback_evaluation(user_answer)
     
+    def evaluate_answers(self, questions: List[str], user_answers: List[str], document_content: Document) -> List[Dict[str, Any]]:
+        """Evaluate answers to several challenge questions with one structured-output call.
+
+        Falls back to evaluating the answers one by one, concurrently, if the
+        combined response cannot be used.
+        """
+        try:
+            answers = "\n\n".join(
+                f"Question {i + 1}: {question}\nUser's Answer {i + 1}: {user_answer}"
+                for i, (question, user_answer) in enumerate(zip(questions, user_answers))
+            )
+            def prompt(document: Document) -> str:
+                return f"""Evaluate each of the following answers to questions based on the provided document. 
+For every answer provide a score from 1-10, constructive feedback, and justification.
+
+{self._document_section(document)}
+
+{answers}
+
+Please evaluate every answer and provide your response as a JSON array with exactly {len(questions)} objects, in question order:
+[
+    {{
+        "score": [number from 1-10],
+        "feedback": "[Constructive feedback on the answer]",
+        "justification": "[Explanation of how you evaluated the answer]"
+    }}
+]"""
+
+            response = self._generate_about(
+                "evaluation_batch", document_content, prompt,
+                types.GenerateContentConfig(response_mime_type="application/json")
+            )
+
+            with metrics.timed("parse"):
+                results = json.loads(response.text) if response.text else None
+            if isinstance(results, list) and len(results) == len(questions):
+                return [self._evaluation_from_result(result) for result in results]
+            logger.warning("Combined evaluation did not return one result per answer; evaluating separately")
+            
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error evaluating answers: {e}")
+        
+        metrics.FALLBACKS.inc("evaluation_batch")
+        with ThreadPoolExecutor(max_workers=max(1, len(questions))) as executor:
+            return list(executor.map(
+                self.evaluate_answer, questions, user_answers, [document_content] * len(questions)
+            ))
+    
+    def _evaluation_from_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize one evaluation object returned by the model"""
+        return {
+            "score": max(1, min(10, int(result.get("score", 5)))),
+            "feedback": result.get("feedback", "Good effort on your answer."),
+            "justification": result.get("justification", "Evaluation based on document content analysis.")
+        }
+    
     def _build_conversation_context(self, conversation_history: List[Tuple]) -> str:
         """Build context string from conversation history"""
         if not conversation_history:
@@ -209,7 +690,7 @@ Please evaluate the answer and provide your response in the following JSON forma
                     answer = line[7:].strip()
                 elif line.startswith("Justification:"):
                     current_section = "justification"
-                    justification = line[13:].strip()
+                    justification = line[14:].strip()
                 elif current_section == "answer" and line:
                     answer += " " + line
                 elif current_section == "justification" and line:
@@ -228,6 +709,7 @@ Please evaluate the answer and provide your response in the following JSON forma
     
     def _fallback_questions(self) -> List[str]:
         """Fallback questions if generation fails"""
+        metrics.FALLBACKS.inc("questions")
         return [
             "What are the main themes or concepts discussed in this document?",
             "What evidence or examples does the document provide to support its key points?",
@@ -236,6 +718,7 @@ Please evaluate the answer and provide your response in the following JSON forma
     
     def _fallback_evaluation(self, user_answer: str) -> Dict[str, Any]:
         """Fallback evaluation if AI evaluation fails"""
+        metrics.FALLBACKS.inc("evaluation")
         score = 5
         if len(user_answer.split()) > 20:
             score = 6
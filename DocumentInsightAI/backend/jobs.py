@@ -0,0 +1,158 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """Progress and outcome of one background task"""
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.stage = "queued"
+        self.current: Optional[int] = None
+        self.total: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Seconds to wait before retrying, when the job was refused for overload
+        self.retry_after: Optional[int] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self._done = threading.Event()
+        # Called after every update, to publish the job's status beyond this process
+        self._listener: Optional[Callable[["Job"], None]] = None
+
+    def update(self, stage: str, current: Optional[int] = None, total: Optional[int] = None):
+        """Record the stage the job has reached and, optionally, how far into it"""
+        self.stage = stage
+        self.current = current
+        self.total = total
+        if self._listener is not None:
+            self._listener(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; False if ``timeout`` expired first"""
+        return self._done.wait(timeout)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"job_id": self.id, "stage": self.stage}
+        if self.total is not None:
+            data["progress"] = {"current": self.current, "total": self.total}
+        if self.result is not None:
+            data.update(self.result)
+        if self.error is not None:
+            data["error"] = self.error
+        if self.retry_after is not None:
+            data["retry_after"] = self.retry_after
+        return data
+
+
+class JobQueue:
+    """Runs jobs on a bounded thread pool and keeps their status for polling.
+
+    At most ``max_pending`` jobs may be queued or running at once; finished
+    jobs are kept for ``retention`` seconds. With a ``shared`` status store
+    (e.g. ``SharedSessionStore``), each job's status is also written there,
+    at most every ``publish_interval`` seconds while its stage is unchanged,
+    so any worker process can report or wait for it.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, retention: float = 3600,
+                 shared: Optional[Any] = None, publish_interval: float = 0.5):
+        self.max_pending = max_pending
+        self.retention = retention
+        self.shared = shared
+        self.publish_interval = publish_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._published: Dict[str, Tuple[str, float]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Optional[Dict[str, Any]]], *args) -> Job:
+        """Queue ``fn(job, *args)``; its return value becomes the job result"""
+        job = Job()
+        with self._lock:
+            self._prune()
+            if self._pending >= self.max_pending:
+                raise QueueFullError("Too many documents are being processed, please retry shortly")
+            self._pending += 1
+            self._jobs[job.id] = job
+        if self.shared is not None:
+            job._listener = self._publish
+            self._publish(job)
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job run by this process or, through the shared store, by any other"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.shared is not None:
+            return self.shared.get_job(job_id)
+        return None
+
+    def wait_result(self, job_id: str, timeout: float, poll_interval: float = 0.25) -> Optional[Dict[str, Any]]:
+        """Wait up to ``timeout`` seconds for a job to finish; its result, or None if it failed, timed out or is unknown"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.result if job.wait(timeout) else None
+        if self.shared is None:
+            return None
+        # Run by another worker process, so poll its published status
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.shared.get_job(job_id)
+            if status is None or status["stage"] == "failed":
+                return None
+            if status["stage"] == "done":
+                return status
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def _publish(self, job: Job):
+        """Write a job's status to the shared store, throttling progress-only updates"""
+        now = time.monotonic()
+        with self._lock:
+            stage, published = self._published.get(job.id, (None, 0.0))
+            if stage == job.stage and job.finished is None and now - published < self.publish_interval:
+                return
+            self._published[job.id] = (job.stage, now)
+        self.shared.put_job(job.id, job.to_dict(), job.finished is not None)
+
+    def _run(self, job: Job, fn: Callable[..., Optional[Dict[str, Any]]], args: tuple):
+        stage = "failed"
+        try:
+            job.result = fn(job, *args)
+            stage = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.retry_after = getattr(e, "retry_after", None)
+        finally:
+            job.finished = time.time()
+            try:
+                # Publishes the final status, result included, before anyone is woken
+                job.update(stage)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    self._published.pop(job.id, None)
+                job._done.set()
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import math
+import queue
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+import metrics
+from admission import OverloadedError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: request timeout, rate limiting and server-side failures
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+# Connection and timeout errors of the HTTP libraries behind the clients
+# (httpx, aiohttp, openai), matched by class name so none has to be importable
+_TRANSPORT_ERRORS = frozenset({"TransportError", "TimeoutException", "ClientConnectionError",
+                               "ServerTimeoutError", "APIConnectionError"})
+
+_END = object()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed call may succeed if repeated: timeouts, dropped connections, 408/429/5xx"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _TRANSPORT_ERRORS for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS
+
+
+class CircuitOpenError(OverloadedError):
+    """Raised without calling the upstream while its circuit breaker is open"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("The AI service is unavailable, please retry shortly", 503, retry_after)
+
+
+class CircuitBreaker:
+    """Fails fast after ``failure_threshold`` consecutive upstream failures.
+
+    Once open, calls are refused for ``reset_timeout`` seconds. Then a single
+    trial call is let through (half-open); its success closes the circuit
+    and its failure opens it again.
+    """
+
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the upstream should not be called now"""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise self._reject(remaining)
+                self._set_state("half_open")
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    raise self._reject(1)
+                self._trial_in_flight = True
+
+    def release(self):
+        """Forget a call that was abandoned before its outcome was known"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._opened += 1
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def _reject(self, remaining: float) -> CircuitOpenError:
+        metrics.LLM_REJECTIONS.inc("circuit_open")
+        return CircuitOpenError(max(1, math.ceil(remaining)))
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.LLM_CIRCUIT_STATE.set(self.STATES[state], self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._opened
+            }
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def shared_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop all LLM calls run on, started in a daemon thread on first use.
+
+    Async clients keep their connection pools per event loop, so running
+    every call on one loop lets the pools be reused across requests. It is
+    started lazily so a forking server starts it in each worker.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-transport", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+class LLMTransport:
+    """Deadlines, retries and circuit breaking for calls made with an async LLM client.
+
+    ``call`` awaits a request coroutine at most ``max_attempts`` times within
+    one ``deadline`` in seconds, sleeping an exponential backoff with full
+    jitter (a random delay up to ``backoff_base * 2**attempt``, capped at
+    ``backoff_max``) between attempts at retryable errors. ``run`` and
+    ``stream`` are the sync facade: they run the call on the shared event
+    loop and block the calling thread until it finishes.
+    """
+
+    def __init__(self, name: str, deadline: float = 60, max_attempts: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8, failure_threshold: int = 5, reset_timeout: float = 30,
+                 retryable: Callable[[BaseException], bool] = is_retryable):
+        self.name = name
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retryable = retryable
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self._retries = 0
+        self._timeouts = 0
+
+    async def call(self, operation: str, request: Callable[[], Awaitable[T]], deadline: Optional[float] = None) -> T:
+        """Await ``request()``, retrying retryable failures until the deadline; raises the last error"""
+        expires = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await asyncio.wait_for(request(), max(0.0, expires - time.monotonic()))
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+                    self._timeouts += 1
+                if not self.retryable(e):
+                    # The upstream answered; the request itself was at fault
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                if attempt >= self.max_attempts or time.monotonic() + delay >= expires:
+                    raise
+                self._retries += 1
+                metrics.LLM_RETRIES.inc(operation)
+                logger.info(f"Retrying {operation} in {delay:.2f}s after attempt {attempt} failed: {e!r}")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def run(self, operation: str, request: Callable[[], Awaitable[T]], deadline: Optional[float] = None) -> T:
+        """Sync facade for ``call``"""
+        return asyncio.run_coroutine_threadsafe(self.call(operation, request, deadline), shared_loop()).result()
+
+    def stream(self, operation: str, request: Callable[[], Awaitable[AsyncIterator[T]]],
+               deadline: Optional[float] = None) -> Iterator[T]:
+        """Sync facade iterating an async stream.
+
+        Opening the stream and reading its first item is one ``call``, retried
+        like any other; once items are flowing, each must arrive within the
+        deadline, and a failure is raised to the caller rather than retried.
+        """
+        items: "queue.Queue[Any]" = queue.Queue()
+        chunk_deadline = deadline or self.deadline
+
+        async def first():
+            iterator = (await request()).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _END
+            except BaseException:
+                # Timed out or failed before the first item: close this attempt's stream before any retry opens another
+                if hasattr(iterator, "aclose"):
+                    await iterator.aclose()
+                raise
+
+        async def pump():
+            iterator = None
+            try:
+                iterator, item = await self.call(operation, first, deadline)
+                while item is not _END:
+                    items.put(item)
+                    try:
+                        item = await asyncio.wait_for(iterator.__anext__(), chunk_deadline)
+                    except StopAsyncIteration:
+                        item = _END
+            except BaseException as e:
+                items.put(e)
+                raise
+            finally:
+                items.put(_END)
+                if iterator is not None and hasattr(iterator, "aclose"):
+                    await iterator.aclose()
+
+        future = asyncio.run_coroutine_threadsafe(pump(), shared_loop())
+        try:
+            while True:
+                item = items.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Stop reading the stream if the caller gave up early
+            future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Circuit breaker state, retries and timed-out attempts since start-up"""
+        return {
+            "upstream": self.name,
+            "deadline_seconds": self.deadline,
+            "max_attempts": self.max_attempts,
+            "retries": self._retries,
+            "timeouts": self._timeouts,
+            "circuit": self.breaker.stats()
+        }
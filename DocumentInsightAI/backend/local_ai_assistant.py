@@ -9,6 +9,7 @@ import nltk
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 import warnings
+from assistants import FallbackText
 warnings.filterwarnings("ignore")
 
 # Download required NLTK data
@@ -98,8 +99,8 @@ class LocalAIAssistant:
             # Fallback summary
             words = document_content.split()
             if len(words) > 150:
-                return " ".join(words[:150]) + "..."
-            return document_content
+                return FallbackText(" ".join(words[:150]) + "...")
+            return FallbackText(document_content)
     
     def answer_question(self, question: str, document_content: str, conversation_history: List[Tuple]) -> Tuple[str, str]:
         """Answer a question based on document content using local AI"""
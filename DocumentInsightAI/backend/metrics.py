@@ -0,0 +1,190 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from fast in-process stages up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, optionally split by label values"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by label values"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        """Observe the wall time of the enclosed block, even if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "docinsight_request_duration_seconds", "API request latency by endpoint", ("endpoint", "method", "status")
+)
+STAGE_LATENCY = registry.histogram(
+    "docinsight_stage_duration_seconds", "Latency of document pipeline stages", ("stage",)
+)
+LLM_TOKENS = registry.counter(
+    "docinsight_llm_tokens_total", "Tokens sent to and generated by the LLM", ("operation", "kind")
+)
+LLM_ERRORS = registry.counter(
+    "docinsight_llm_errors_total", "LLM calls that raised", ("operation",)
+)
+LLM_TIME_TO_FIRST_TOKEN = registry.histogram(
+    "docinsight_llm_time_to_first_token_seconds", "Time to the first streamed answer token"
+)
+FALLBACKS = registry.counter(
+    "docinsight_fallbacks_total", "Responses served from a non-LLM fallback", ("kind",)
+)
+
+LLM_IN_FLIGHT = registry.gauge(
+    "docinsight_llm_in_flight", "LLM calls currently holding an admission slot"
+)
+LLM_QUEUE_DEPTH = registry.gauge(
+    "docinsight_llm_queue_depth", "Callers waiting for an LLM admission slot", ("queue",)
+)
+LLM_QUEUE_WAIT = registry.histogram(
+    "docinsight_llm_queue_wait_seconds", "Time spent waiting for an LLM admission slot"
+)
+LLM_REJECTIONS = registry.counter(
+    "docinsight_llm_rejections_total", "LLM calls refused by admission control or an open circuit", ("reason",)
+)
+QUESTION_PRECOMPUTE = registry.counter(
+    "docinsight_question_precompute_total",
+    "Speculative challenge question generation: queued, skipped, hit, waited or missed", ("outcome",)
+)
+
+LLM_RETRIES = registry.counter(
+    "docinsight_llm_retries_total", "LLM call attempts retried after a retryable error", ("operation",)
+)
+LLM_CIRCUIT_STATE = registry.gauge(
+    "docinsight_llm_circuit_state", "LLM upstream circuit breaker: 0 closed, 1 half-open, 2 open", ("upstream",)
+)
+CONTEXT_CACHE = registry.counter(
+    "docinsight_context_cache_total",
+    "Per-session LLM context caches: created, create_failed, extended, expired or unusable", ("event",)
+)
+
+
+def timed(stage: str):
+    """Time a pipeline stage (extract, chunk, retrieve, llm, parse, ...)"""
+    return STAGE_LATENCY.time(stage)
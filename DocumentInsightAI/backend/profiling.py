@@ -0,0 +1,87 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval.
+
+    Output is in collapsed-stack format (``root;caller;callee count`` per line),
+    which flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """Profiles the current thread from ``start`` until ``stop`` and writes the result.
+
+    ``cprofile`` records every call deterministically and writes a ``.pstats``
+    file; ``sample`` has lower overhead and writes ``.collapsed`` stacks.
+    """
+
+    def __init__(self, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+
+    def start(self) -> "RequestProfiler":
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = SamplingProfiler(threading.get_ident())
+            self._sampler.start()
+        return self
+
+    def stop(self, directory: str, label: str) -> str:
+        """Stop profiling and write the output file, returning its path"""
+        os.makedirs(directory, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_") or "request"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{uuid.uuid4().hex[:8]}"
+        if self._profiler is not None:
+            self._profiler.disable()
+            path = os.path.join(directory, f"{name}.pstats")
+            self._profiler.dump_stats(path)
+        else:
+            self._sampler.stop()
+            path = os.path.join(directory, f"{name}.collapsed")
+            self._sampler.write(path)
+        return path
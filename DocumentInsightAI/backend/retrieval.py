@@ -0,0 +1,148 @@
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# Terms matched by the index: runs of word characters, compared lowercased
+_TERM = re.compile(r'\w+')
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Rough characters per model token, for budgeting prompt text without tokenizing it
+CHARS_PER_TOKEN = 4
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased index terms of a text"""
+    return _TERM.findall(text.lower())
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate model tokens in a text"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class Passage(NamedTuple):
+    """A retrieved chunk, its source document and page, and its character span"""
+    chunk: int
+    document: int
+    page: int
+    start: int
+    end: int
+    score: float
+
+
+class CorpusIndex:
+    """BM25 index over the chunks of one or more documents joined into one text.
+
+    Chunks are ``(document, page, start, end)`` rows whose offsets index the
+    joined text, so passage text is sliced out only for the passages that
+    are returned. Postings are kept in integer arrays per term.
+    """
+
+    def __init__(self, text: str, chunks: Iterable[Sequence[int]]):
+        self.text = text
+        self.documents = array("i")
+        self.pages = array("i")
+        self.starts = array("q")
+        self.ends = array("q")
+        self._lengths = array("i")
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        for document, page, start, end in chunks:
+            chunk = len(self.starts)
+            self.documents.append(document)
+            self.pages.append(page)
+            self.starts.append(start)
+            self.ends.append(end)
+            counts = Counter(terms(text[start:end]))
+            self._lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("i"), array("i"))
+                postings[0].append(chunk)
+                postings[1].append(count)
+        self._average_length = (sum(self._lengths) / len(self._lengths) if self._lengths else 0) or 1
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def search(self, query: str, k: int = 8) -> List[Passage]:
+        """Return up to ``k`` chunks sharing terms with the query, best first"""
+        scores: Dict[int, float] = {}
+        num_chunks = len(self)
+        for term in set(terms(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            chunks, counts = postings
+            idf = math.log(1 + (num_chunks - len(chunks) + 0.5) / (len(chunks) + 0.5))
+            for chunk, count in zip(chunks, counts):
+                norm = 1 - BM25_B + BM25_B * self._lengths[chunk] / self._average_length
+                scores[chunk] = scores.get(chunk, 0.0) + idf * count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+        return [
+            Passage(chunk, self.documents[chunk], self.pages[chunk], self.starts[chunk], self.ends[chunk], score)
+            for chunk, score in heapq.nlargest(k, scores.items(), key=itemgetter(1))
+        ]
+
+    def passage_text(self, passage: Passage) -> str:
+        return self.text[passage.start:passage.end]
+
+
+def pack_passages(passages: Sequence[Passage], token_budget: int) -> List[Tuple[int, int, int]]:
+    """Fit the best passages into a token budget as (document, start, end) spans.
+
+    Passages are taken best first while they fit, then put back in text order
+    with overlapping spans of the same document merged, so text shared by
+    neighbouring chunks is only sent once.
+    """
+    chosen, used = [], 0
+    for passage in passages:
+        cost = -(-(passage.end - passage.start) // CHARS_PER_TOKEN)
+        if used + cost <= token_budget:
+            chosen.append(passage)
+            used += cost
+    spans: List[List[int]] = []
+    for passage in sorted(chosen, key=lambda passage: (passage.document, passage.start)):
+        if spans and spans[-1][0] == passage.document and passage.start <= spans[-1][2]:
+            spans[-1][2] = max(spans[-1][2], passage.end)
+        else:
+            spans.append([passage.document, passage.start, passage.end])
+    return [(document, start, end) for document, start, end in spans]
+
+
+class IndexCache:
+    """Per-process LRU of built indexes, keyed by session ID.
+
+    Sessions hold only the chunk rows an index is built from, which keeps
+    them serializable for the shared session backend; a worker that has not
+    seen a session yet rebuilds its index on first use.
+    """
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._indexes: "OrderedDict[str, CorpusIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, build: Callable[[], CorpusIndex]) -> CorpusIndex:
+        """Return the cached index for ``key``, building it with ``build`` on a miss"""
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+        index = build()
+        self.put(key, index)
+        return index
+
+    def put(self, key: str, index: CorpusIndex):
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.size:
+                self._indexes.popitem(last=False)
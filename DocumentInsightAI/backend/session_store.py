@@ -0,0 +1,386 @@
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Session fields that are never changed in place once a session is stored,
+# so their size is measured once rather than on every store
+_IMMUTABLE_FIELDS = ('content', 'chunks', 'documents')
+
+
+def estimate_size(obj: Any) -> int:
+    """Approximate bytes held by a session value (strings, numbers and nested containers)"""
+    if isinstance(obj, dict):
+        # A snapshot, since other threads may add or pop keys while the size is measured
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in list(obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+class SessionStore:
+    """Thread-safe in-memory document session store with a byte budget and idle TTL.
+
+    Supports the ``in`` / ``[]`` access of the dict it replaces. Sessions idle
+    for longer than ``ttl`` seconds expire, and the least recently used
+    sessions are evicted while the estimated total exceeds ``max_bytes``.
+    A session's size is re-estimated, outside the store lock, whenever it is
+    stored, so in-place changes (e.g. a growing conversation history) are
+    accounted for once the session is assigned back. The large fields that
+    never change (text, corpus chunks and documents) are only measured once.
+
+    ``on_remove``, if given, is called with the ID and contents of every
+    session that is evicted, expires or is deleted, once the store lock has
+    been released.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, ttl: float = 6 * 3600,
+                 on_remove: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_remove = on_remove
+        self._removed: List[Tuple[str, Dict[str, Any]]] = []
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        # Session ID -> field -> (value, size) for the fields in _IMMUTABLE_FIELDS
+        self._field_sizes: Dict[str, Dict[str, Tuple[Any, int]]] = {}
+        self._accessed: Dict[str, float] = {}
+        self._bytes = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, session_id: str) -> bool:
+        try:
+            with self._lock:
+                return self._live(session_id)
+        finally:
+            self._notify_removed()
+
+    def __getitem__(self, session_id: str) -> Dict[str, Any]:
+        try:
+            with self._lock:
+                if not self._live(session_id):
+                    raise KeyError(session_id)
+                self._touch(session_id)
+                return self._sessions[session_id]
+        finally:
+            self._notify_removed()
+
+    def get(self, session_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, session_id: str, session: Dict[str, Any]):
+        size, field_sizes = self._estimate(session_id, session)
+        with self._lock:
+            self._sessions[session_id] = session
+            self._bytes += size - self._sizes.get(session_id, 0)
+            self._sizes[session_id] = size
+            self._field_sizes[session_id] = field_sizes
+            self._touch(session_id)
+            self._expire()
+            self._evict()
+        self._notify_removed()
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+        self._notify_removed()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _live(self, session_id: str) -> bool:
+        """Whether the session exists, expiring it first if it has been idle too long"""
+        if session_id not in self._sessions:
+            return False
+        if time.time() - self._accessed[session_id] > self.ttl:
+            self._remove(session_id)
+            self._expirations += 1
+            return False
+        return True
+
+    def _estimate(self, session_id: str, session: Dict[str, Any]) -> Tuple[int, Dict[str, Tuple[Any, int]]]:
+        """Estimate a session's size, reusing the sizes of immutable fields measured when it was last stored"""
+        with self._lock:
+            known = self._field_sizes.get(session_id, {})
+        size = sys.getsizeof(session)
+        field_sizes = {}
+        # Measured outside the lock while other threads may still change the dict, so iterate a snapshot
+        for key, value in list(session.items()):
+            if key in _IMMUTABLE_FIELDS:
+                cached = known.get(key)
+                value_size = cached[1] if cached is not None and cached[0] is value else estimate_size(value)
+                field_sizes[key] = (value, value_size)
+            else:
+                value_size = estimate_size(value)
+            size += estimate_size(key) + value_size
+        return size, field_sizes
+
+    def _touch(self, session_id: str):
+        """Mark the session most recently used"""
+        self._accessed[session_id] = time.time()
+        self._sessions.move_to_end(session_id)
+
+    def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        del self._accessed[session_id]
+        self._field_sizes.pop(session_id, None)
+        self._bytes -= self._sizes.pop(session_id)
+        if self.on_remove is not None:
+            self._removed.append((session_id, session))
+
+    def _notify_removed(self):
+        """Pass sessions removed under the lock to on_remove, outside it"""
+        with self._lock:
+            removed, self._removed = self._removed, []
+        for session_id, session in removed:
+            self.on_remove(session_id, session)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        # Sessions are ordered by last access, so expired ones are at the front
+        while self._sessions:
+            session_id = next(iter(self._sessions))
+            if self._accessed[session_id] > cutoff:
+                break
+            self._remove(session_id)
+            self._expirations += 1
+
+    def _evict(self):
+        # Never evict the most recent session, even if it alone is over budget
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove(next(iter(self._sessions)))
+            self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Session count, estimated bytes held and eviction counters"""
+        with self._lock:
+            self._expire()
+            stats = {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+        self._notify_removed()
+        return stats
+
+
+class SharedSessionStore:
+    """Document sessions shared by every worker process on the host.
+
+    Each session's extracted text is written once to its own UTF-8 file and
+    read back through a read-only memory map, so all workers share the same
+    page-cache copy; decoded texts are kept in a small per-process LRU. The
+    rest of the session is a JSON row in a SQLite index in WAL mode, so any
+    worker can serve any session. Unlike ``SessionStore``, in-place changes
+    are not seen by other workers until the session is assigned back.
+
+    The index also holds the status of background jobs (see ``JobQueue``),
+    so a job can be polled through any worker; finished jobs are kept for
+    ``job_retention`` seconds. ``on_remove`` is called as for ``SessionStore``,
+    by the worker that removes the session, without the session's text.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 * 1024 * 1024,
+                 ttl: float = 6 * 3600, cache_size: int = 8, job_retention: float = 3600,
+                 on_remove: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.job_retention = job_retention
+        self.on_remove = on_remove
+        self._removed: List[Tuple[str, Dict[str, Any]]] = []
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " finished REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection, committing on success"""
+        conn = sqlite3.connect(os.path.join(self.directory, "sessions.sqlite3"), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _text_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.txt")
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __getitem__(self, session_id: str) -> Dict[str, Any]:
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def get(self, session_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT data, accessed FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._remove(conn, session_id)
+                self._expirations += 1
+                row = None
+            if row is not None:
+                conn.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (now, session_id))
+        self._notify_removed()
+        if row is None:
+            return default
+        session = json.loads(row[0])
+        session['content'] = self._read_text(session_id)
+        return session
+
+    def __setitem__(self, session_id: str, session: Dict[str, Any]):
+        path = self._text_path(session_id)
+        if not os.path.exists(path):
+            # The text never changes once a session exists, so write it only once
+            encoded = session['content'].encode("utf-8")
+            partial_path = f"{path}.{os.getpid()}.partial"
+            with open(partial_path, "wb") as f:
+                f.write(encoded)
+            os.replace(partial_path, path)
+        data = json.dumps({key: value for key, value in session.items() if key != 'content'})
+        size = len(data) + os.path.getsize(path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, size, accessed) VALUES (?, ?, ?, ?)",
+                (session_id, data, size, time.time())
+            )
+            self._expire(conn)
+            self._evict(conn)
+        self._notify_removed()
+
+    def __delitem__(self, session_id: str):
+        with self._connect() as conn:
+            self._remove(conn, session_id)
+        self._notify_removed()
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def put_job(self, job_id: str, status: Dict[str, Any], finished: bool = False):
+        """Record a job's status for every worker, forgetting jobs finished more than job_retention ago"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, finished) VALUES (?, ?, ?)",
+                (job_id, json.dumps(status), now if finished else None)
+            )
+            if finished:
+                conn.execute("DELETE FROM jobs WHERE finished < ?", (now - self.job_retention,))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's last recorded status, or None if it is unknown or has been forgotten"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _read_text(self, session_id: str) -> str:
+        """Decode a session's text straight from its memory map, caching recent ones"""
+        with self._lock:
+            text = self._texts.get(session_id)
+            if text is not None:
+                self._texts.move_to_end(session_id)
+                return text
+        with open(self._text_path(session_id), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                text = ""
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    text = str(mapped, "utf-8")
+        with self._lock:
+            self._texts[session_id] = text
+            while len(self._texts) > self.cache_size:
+                self._texts.popitem(last=False)
+        return text
+
+    def _remove(self, conn: sqlite3.Connection, session_id: str):
+        if self.on_remove is not None:
+            row = conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is not None:
+                with self._lock:
+                    self._removed.append((session_id, json.loads(row[0])))
+        conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        with self._lock:
+            self._texts.pop(session_id, None)
+        try:
+            os.unlink(self._text_path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _notify_removed(self):
+        """Pass sessions removed by this worker to on_remove, once their transaction has committed"""
+        with self._lock:
+            removed, self._removed = self._removed, []
+        for session_id, session in removed:
+            self.on_remove(session_id, session)
+
+    def _expire(self, conn: sqlite3.Connection):
+        cutoff = time.time() - self.ttl
+        for (session_id,) in conn.execute("SELECT id FROM sessions WHERE accessed < ?", (cutoff,)).fetchall():
+            self._remove(conn, session_id)
+            self._expirations += 1
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used sessions until the store fits in max_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Skip the most recent session, even if it alone is over budget
+        rows = conn.execute("SELECT id, size FROM sessions ORDER BY accessed").fetchall()[:-1]
+        for session_id, size in rows:
+            self._remove(conn, session_id)
+            self._evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        """Session count, bytes on disk and this worker's eviction counters"""
+        with self._connect() as conn:
+            sessions, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {
+            "sessions": sessions,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "evictions": self._evictions,
+            "expirations": self._expirations
+        }
@@ -0,0 +1,100 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import metrics
+from retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+# Where a piece may end, best first: paragraph break, line break, sentence end, any space
+_BREAKS = ("\n\n", "\n", ". ", " ")
+
+
+def split_budgeted(text: str, token_budget: int) -> List[str]:
+    """Split text into consecutive pieces of at most ``token_budget`` estimated tokens.
+
+    Each piece ends at the last paragraph break, line break, sentence end or
+    space in the second half of its budget, so words are not cut. The pieces
+    join back into the original text: nothing is dropped or repeated.
+    """
+    max_chars = max(1, token_budget * CHARS_PER_TOKEN)
+    pieces, start = [], 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        for mark in _BREAKS:
+            cut = text.rfind(mark, start + max_chars // 2, end)
+            if cut != -1:
+                end = cut + len(mark)
+                break
+        pieces.append(text[start:end])
+        start = end
+    pieces.append(text[start:])
+    return [piece for piece in pieces if piece.strip()]
+
+
+class MapReduceSummarizer:
+    """Summarizes text of any length with a tree of bounded-size model calls.
+
+    Text over ``chunk_tokens`` is split into pieces that are summarized
+    concurrently, at most ``max_workers`` at a time. The partial summaries
+    are joined in document order and, while they still exceed the budget,
+    split and summarized again, until one call can write the final summary.
+    Every level runs its calls in parallel, so with enough workers the
+    latency is about one chunk's call per level of the tree rather than one
+    call over the whole text, and every part of the text reaches the final
+    summary through a partial summary.
+
+    ``complete`` sends one prompt to the model and returns its text. Each
+    call runs in a copy of the caller's context, so context such as
+    background admission (see ``AdmissionController.background``) carries
+    over to the worker threads.
+    """
+
+    def __init__(self, complete: Callable[[str], str], chunk_tokens: int = 16000,
+                 max_workers: int = 4, partial_words: int = 200):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.partial_words = partial_words
+
+    def needed(self, text: str) -> bool:
+        """Whether the text is too long to summarize in a single call"""
+        return estimate_tokens(text) > self.chunk_tokens
+
+    def summarize(self, text: str, words: int = 150) -> str:
+        """Summarize ``text`` in at most ``words`` words"""
+        level = 0
+        while self.needed(text):
+            pieces = split_budgeted(text, self.chunk_tokens)
+            with metrics.timed("summary_map" if level == 0 else "summary_reduce"):
+                # One copy per call: a context cannot be entered by two threads at once
+                contexts = [contextvars.copy_context() for _ in pieces]
+                with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pieces)))) as executor:
+                    partials = list(executor.map(
+                        lambda piece, context: context.run(self.complete, self._partial_prompt(piece, level > 0)),
+                        pieces, contexts
+                    ))
+            reduced = "\n\n".join(partial.strip() for partial in partials)
+            if len(reduced) >= len(text):
+                # The partial summaries are no shorter than their input; stop rather than loop
+                break
+            text = reduced
+            level += 1
+        return self.complete(self._final_prompt(text, words, level > 0)).strip()
+
+    def _partial_prompt(self, text: str, of_summaries: bool) -> str:
+        source = "summaries of consecutive parts of a longer document" if of_summaries else "one part of a longer document"
+        return f"""The following text is {source}. Summarize it in no more than {self.partial_words} words.
+Keep every main point, key finding, figure and conclusion, in the order they appear; later steps only see your summary:
+
+{text}
+
+Summary:"""
+
+    def _final_prompt(self, text: str, words: int, of_summaries: bool) -> str:
+        source = "summaries of consecutive parts of one document, in order" if of_summaries else "a document"
+        return f"""The following text is {source}. Please provide a concise summary of the whole document in no more than {words} words.
+Focus on the main points, key findings, and important conclusions:
+
+{text}
+
+Summary:"""
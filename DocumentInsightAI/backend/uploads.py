@@ -0,0 +1,118 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import uuid
+from typing import BinaryIO, Optional
+from flask import Request, current_app
+
+# Uploads larger than this are spooled straight to a named file on disk
+SPOOL_MAX_MEMORY = 500 * 1024
+# Block size used when hashing an upload
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadRequest(Request):
+    """Request class that spools large file uploads to named files in UPLOAD_FOLDER.
+
+    A named file lets worker processes open the upload themselves instead of
+    receiving a pickled copy of its bytes.
+    """
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        """MAX_CONTENT_LENGTH, or the endpoint's own limit from UPLOAD_SIZE_LIMITS"""
+        limits = current_app.config.get('UPLOAD_SIZE_LIMITS', {})
+        return limits.get(self.endpoint, current_app.config['MAX_CONTENT_LENGTH'])
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= SPOOL_MAX_MEMORY:
+            return io.BytesIO()
+        return tempfile.NamedTemporaryFile(
+            mode="w+b",
+            dir=current_app.config['UPLOAD_FOLDER'],
+            prefix="upload-"
+        )
+
+
+class UploadedFile:
+    """A seekable, read-only handle on an uploaded document.
+
+    Exposes ``name`` and ``type`` like the Streamlit upload objects the
+    DocumentProcessor was written against, but hands out the underlying
+    stream instead of copying its contents.
+    """
+
+    def __init__(self, stream: BinaryIO, name: str, type: str):
+        self._stream = stream
+        self.name = name
+        self.type = type
+        # Set on detached copies, which remove their file when closed
+        self._owned_path: Optional[str] = None
+
+    @classmethod
+    def from_file_storage(cls, file_storage) -> "UploadedFile":
+        """Wrap a werkzeug FileStorage without saving or reading it"""
+        return cls(file_storage.stream, file_storage.filename, file_storage.content_type)
+
+    @classmethod
+    def from_path(cls, path: str, name: str, type: str, owned: bool = False) -> "UploadedFile":
+        """Open a file already on disk; an ``owned`` file is removed when the handle is closed"""
+        upload = cls(open(path, "rb"), name, type)
+        if owned:
+            upload._owned_path = path
+        return upload
+
+    @property
+    def path(self) -> Optional[str]:
+        """Filesystem path of the upload, if it is backed by a named file"""
+        path = getattr(self._stream, "name", None)
+        if isinstance(path, str) and os.path.isfile(path):
+            return path
+        return None
+
+    def detach(self) -> "UploadedFile":
+        """Return a handle that stays valid after the request has finished.
+
+        A disk-backed upload is hard-linked rather than copied; a small
+        in-memory one is copied. Close the returned handle when done.
+        """
+        path = self.path
+        if path is None:
+            return UploadedFile(io.BytesIO(self.read()), self.name, self.type)
+        detached_path = os.path.join(os.path.dirname(path), f"detached-{uuid.uuid4().hex}")
+        try:
+            os.link(path, detached_path)
+        except OSError:
+            shutil.copyfile(path, detached_path)
+        return UploadedFile.from_path(detached_path, self.name, self.type, owned=True)
+
+    def open(self) -> BinaryIO:
+        """Return the underlying stream rewound to the start"""
+        self._stream.seek(0)
+        return self._stream
+
+    def content_hash(self) -> str:
+        """SHA-256 hex digest of the upload, read in blocks rather than all at once"""
+        digest = hashlib.sha256()
+        stream = self.open()
+        for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        return digest.hexdigest()
+
+    def read(self) -> bytes:
+        """Read the whole upload into memory"""
+        return self.open().read()
+
+    def close(self):
+        self._stream.close()
+        if self._owned_path is not None:
+            os.unlink(self._owned_path)
+            self._owned_path = None
+
+    def __enter__(self) -> "UploadedFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,89 @@
+"""Measure cold start of the backend for each assistant backend.
+
+Starts `python app.py` in a fresh process per backend and reports the time to
+the first healthy /api/health, the time until the assistant reports ready
+(after POST /api/warmup when --warmup lazy is used) and the server's RSS at
+that point.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--backends gemini simple] [--warmup background]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+BASE_URL = "http://127.0.0.1:5000"
+
+
+def get_json(path: str, method: str = "GET"):
+    request = urllib.request.Request(BASE_URL + path, method=method)
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.loads(response.read())
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def measure(backend: str, warmup: str, timeout: float):
+    env = dict(os.environ, ASSISTANT_BACKEND=backend, ASSISTANT_WARMUP=warmup)
+    started = time.perf_counter()
+    # Run without the reloader so the measured pid is the one serving requests
+    server = subprocess.Popen(
+        [sys.executable, "-c", "import app; app.app.run(host='127.0.0.1', port=5000)"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        healthy = ready = None
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            try:
+                status = get_json("/api/health")
+            except OSError:
+                time.sleep(0.05)
+                continue
+            if healthy is None:
+                healthy = time.perf_counter() - started
+                if warmup == "lazy":
+                    get_json("/api/warmup", method="POST")
+                    status = get_json("/api/health")
+            if status["assistant"]["ready"]:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.05)
+        return healthy, ready, rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["gemini", "openai", "simple", "local"])
+    parser.add_argument("--warmup", choices=["eager", "background", "lazy"], default="background")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'healthy s':>10} {'ready s':>8} {'RSS MB':>8}")
+    for backend in args.backends:
+        try:
+            healthy, ready, rss = measure(backend, args.warmup, args.timeout)
+        except Exception as e:
+            print(f"{backend:>8} failed: {e}")
+            continue
+        fmt = lambda value: f"{value:.2f}" if value is not None else "-"
+        print(f"{backend:>8} {fmt(healthy):>10} {fmt(ready):>8} {rss:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
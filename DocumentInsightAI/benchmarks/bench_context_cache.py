@@ -0,0 +1,181 @@
+"""Measure prompt tokens saved by per-session context caching, offline.
+
+Runs a typical session (summary, challenge questions, a few answers and an
+evaluation) against GeminiAIAssistant with a local stand-in for the Gemini
+client, once with the document sent inline on every call and once through a
+context cache. The stand-in counts tokens at 4 characters per token and
+serves cached content like the API does: a cached call's prompt includes the
+cache's tokens and reports them as ``cached_content_token_count``.
+
+Usage:
+    python benchmarks/bench_context_cache.py [--sessions 3] [--tokens 20000] [--questions 5]
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from assistants import CachedDocument  # noqa: E402
+from gemini_ai_assistant import GeminiAIAssistant  # noqa: E402
+from retrieval import estimate_tokens  # noqa: E402
+
+
+class _LocalCaches:
+    """Stand-in for ``client.caches``: keeps cached contents and their expiry in memory"""
+
+    def __init__(self):
+        self.entries = {}
+        self._ids = itertools.count(1)
+
+    def create(self, model, config):
+        text = "".join(part.text for content in config.contents for part in content.parts)
+        name = f"cachedContents/local-{next(self._ids)}"
+        tokens = estimate_tokens(text)
+        self.entries[name] = {"tokens": tokens, "expires": time.time() + float(config.ttl.rstrip("s"))}
+        return SimpleNamespace(name=name, model=model, usage_metadata=SimpleNamespace(total_token_count=tokens))
+
+    def update(self, name, config):
+        self.lookup(name)["expires"] = time.time() + float(config.ttl.rstrip("s"))
+
+    def delete(self, name):
+        self.entries.pop(name, None)
+
+    def lookup(self, name):
+        entry = self.entries.get(name)
+        if entry is None or entry["expires"] < time.time():
+            raise LookupError(f"{name} not found or expired")
+        return entry
+
+
+class _LocalModels:
+    """Stand-in for ``client.models`` returning canned responses in the formats the assistant parses"""
+
+    def __init__(self, caches):
+        self.caches = caches
+
+    def generate_content(self, model, contents, config=None):
+        cached = 0
+        if config is not None and config.cached_content:
+            cached = self.caches.lookup(config.cached_content)["tokens"]
+        text = self._respond(contents, config)
+        return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+            prompt_token_count=estimate_tokens(contents) + cached,
+            candidates_token_count=estimate_tokens(text),
+            cached_content_token_count=cached or None
+        ))
+
+    def generate_content_stream(self, model, contents, config=None):
+        yield self.generate_content(model, contents, config)
+
+    def _respond(self, prompt, config):
+        if config is not None and config.response_mime_type == "application/json":
+            evaluation = {"score": 7, "feedback": "Mostly correct.", "justification": "Matches the document."}
+            count = re.search(r"exactly (\d+) objects", prompt)
+            return json.dumps([evaluation] * int(count.group(1)) if count else evaluation)
+        if "generate exactly 3" in prompt:
+            return "1. What is the method?\n2. What are the results?\n3. What are the limitations?"
+        return "Answer: A stand-in answer.\nJustification: A stand-in justification."
+
+
+class _AsyncModels:
+    """``client.aio.models`` counterpart of the stand-in, as the assistant calls it"""
+
+    def __init__(self, models):
+        self._models = models
+
+    async def generate_content(self, **kwargs):
+        return self._models.generate_content(**kwargs)
+
+    async def generate_content_stream(self, **kwargs):
+        async def chunks():
+            for chunk in self._models.generate_content_stream(**kwargs):
+                yield chunk
+        return chunks()
+
+
+class _AsyncCaches:
+    """``client.aio.caches`` counterpart of the stand-in"""
+
+    def __init__(self, caches):
+        self._caches = caches
+
+    async def create(self, **kwargs):
+        return self._caches.create(**kwargs)
+
+    async def update(self, **kwargs):
+        return self._caches.update(**kwargs)
+
+    async def delete(self, **kwargs):
+        return self._caches.delete(**kwargs)
+
+
+class LocalGeminiClient:
+    """Offline stand-in for ``genai.Client`` that simulates context cache hits and counts tokens"""
+
+    def __init__(self):
+        self.caches = _LocalCaches()
+        self.models = _LocalModels(self.caches)
+        self.aio = SimpleNamespace(models=_AsyncModels(self.models), caches=_AsyncCaches(self.caches))
+
+
+class _TokenCounter:
+    """Wraps a stand-in client to total the prompt and cached tokens of every call"""
+
+    def __init__(self, client):
+        self.prompt = self.cached = 0
+        self._generate = client.models.generate_content
+        client.models.generate_content = self
+
+    def __call__(self, *args, **kwargs):
+        response = self._generate(*args, **kwargs)
+        self.prompt += response.usage_metadata.prompt_token_count
+        self.cached += response.usage_metadata.cached_content_token_count or 0
+        return response
+
+
+def run_session(assistant, document, questions: int):
+    """The calls one session makes: summary, questions, answers and a combined evaluation"""
+    assistant.generate_summary(document)
+    challenge = assistant.generate_challenge_questions(document)
+    history = []
+    for i in range(questions):
+        question = f"What does section {i + 1} say about the results?"
+        history.append((question, *assistant.answer_question(question, document, history)))
+    assistant.evaluate_answers(challenge, ["An answer."] * len(challenge), document)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=20000, help="document size in tokens")
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--ttl", type=float, default=6 * 3600)
+    args = parser.parse_args()
+
+    print(f"{'session':>7} {'inline tokens':>14} {'with cache':>14} {'tokens saved':>13} {'hits':>5}")
+    for session in range(1, args.sessions + 1):
+        text = f"Document {session}. " + "The experiment measured throughput under load. " * (args.tokens * 4 // 48)
+
+        client = LocalGeminiClient()
+        assistant = GeminiAIAssistant(client=client)
+        counter = _TokenCounter(client)
+        run_session(assistant, text, args.questions)
+        inline = counter.prompt
+
+        counter.prompt = counter.cached = 0
+        cache = assistant.create_context_cache(text, args.ttl)
+        run_session(assistant, CachedDocument(cache["name"], text), args.questions)
+        usage = assistant.context_cache_usage(cache["name"])
+        # Creating the cache sends the document once
+        sent = counter.prompt - counter.cached + cache["tokens"]
+        print(f"{session:>7} {inline:>14} {sent:>14} {usage['tokens_saved']:>13} {usage['hits']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Exercise the LLM transport against the local fake server.
+
+Runs concurrent answer_question calls through GeminiAIAssistant, using the
+real async Gemini client pointed at fake_llm_server.py, in three phases:
+a healthy upstream, a flaky one (injected 503s and hung requests) and a
+full outage. For each phase it reports how calls ended, their latency, and
+the transport's retries, timeouts and circuit state. In the outage phase,
+calls should fail fast with the circuit open rather than wait out their
+deadlines.
+
+Usage:
+    python benchmarks/bench_llm_transport.py [--calls 200] [--concurrency 16] [--deadline 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+from gemini_ai_assistant import GeminiAIAssistant  # noqa: E402
+from llm_transport import CircuitOpenError, LLMTransport  # noqa: E402
+
+PHASES = {
+    "healthy": {},
+    "flaky": {"fail_rate": 0.2, "hang_rate": 0.02},
+    "outage": {"outage": (0, float("inf"))},
+}
+
+
+def run_phase(name: str, args) -> None:
+    server = FakeLLMServer(port=0, latency=args.latency, hang_seconds=args.deadline * 4, **PHASES[name]).start()
+    transport = LLMTransport("gemini", deadline=args.deadline, max_attempts=args.attempts,
+                             backoff_base=0.1, backoff_max=1, failure_threshold=5, reset_timeout=args.deadline * 10)
+    assistant = GeminiAIAssistant(transport=transport, base_url=server.url)
+    document = "The experiment measured throughput under load. " * 200
+    outcomes, latencies = Counter(), []
+
+    def one(i: int):
+        started = time.perf_counter()
+        try:
+            answer, _ = assistant.answer_question(f"What does result {i} show?", document, [])
+            outcome = "fallback" if answer.startswith("I encountered an error") else "answered"
+        except CircuitOpenError:
+            outcome = "circuit_open"
+        latencies.append(time.perf_counter() - started)
+        outcomes[outcome] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(one, range(args.calls)))
+    finally:
+        server.stop()
+
+    stats = transport.stats()
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    print(f"{name:>8} {outcomes['answered']:>9} {outcomes['fallback']:>9} {outcomes['circuit_open']:>9} "
+          f"{statistics.median(latencies):>8.3f} {p95:>8.3f} {stats['retries']:>8} {stats['timeouts']:>9} "
+          f"{stats['circuit']['state']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--deadline", type=float, default=5, help="seconds per call, retries included")
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server seconds per response")
+    parser.add_argument("--phases", nargs="+", choices=list(PHASES), default=list(PHASES))
+    args = parser.parse_args()
+
+    print(f"{'phase':>8} {'answered':>9} {'fallback':>9} {'fast-fail':>9} {'p50 s':>8} {'p95 s':>8} "
+          f"{'retries':>8} {'timeouts':>9} {'circuit':>10}")
+    for name in args.phases:
+        run_phase(name, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark serial vs process-pool PDF page extraction.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py [--pages 50 200 500] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from document_processor import DocumentProcessor
+
+
+def build_pdf(num_pages: int, lines_per_page: int = 40) -> bytes:
+    """Build a minimal multi-page text PDF without extra dependencies"""
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    for page_number in range(num_pages):
+        lines = [
+            f"Page {page_number + 1} line {i}: the quick brown fox jumps over the lazy dog."
+            for i in range(lines_per_page)
+        ]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 780 Td"]
+        ops += [f"({line}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin1")
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects.append((content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+        objects.append((page_id, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("latin1")))
+        page_ids.append(page_id)
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.insert(0, (1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.insert(1, (2, f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>".encode("latin1")))
+    objects.insert(2, (font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+    objects.sort()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in objects:
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (next_id)
+    for obj_id in range(1, next_id):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, xref_offset)
+    return bytes(out)
+
+
+class BytesUpload:
+    """Minimal stand-in for an uploaded PDF"""
+    type = "application/pdf"
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+
+def time_extraction(processor: DocumentProcessor, data: bytes, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processor.extract_text(BytesUpload(data))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workers = sorted(set(args.workers))
+    print(f"{'pages':>6} {'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for num_pages in args.pages:
+        data = build_pdf(num_pages)
+        expected = DocumentProcessor().extract_text(BytesUpload(data))
+        baseline = None
+        for worker_count in workers:
+            processor = DocumentProcessor(parallel_workers=worker_count, parallel_min_pages=1)
+            # Warm the pool so process start-up is not billed to the first run
+            processor.extract_text(BytesUpload(data))
+            assert processor.extract_text(BytesUpload(data)) == expected
+            elapsed = time_extraction(processor, data, args.repeat)
+            processor.shutdown()
+            baseline = baseline or elapsed
+            print(f"{num_pages:>6} {worker_count:>8} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
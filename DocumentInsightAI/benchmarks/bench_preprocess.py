@@ -0,0 +1,86 @@
+"""Compare the original three-pass preprocess_text with the fused normalizer.
+
+Reports wall time and tracemalloc peak for the one-shot and page-streamed
+forms, and checks that all of them produce identical output.
+
+Usage:
+    python benchmarks/bench_preprocess.py [--sizes 10 25 50] [--page-kb 4]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from document_processor import DocumentProcessor
+
+WORDS = [
+    "The", "results", "show", "that", "the", "model", "improves", "accuracy", "by", "12%",
+    "(p<0.05)", "over", "the", "baseline.", "Section", "3.2", "describes", "[1]", "x=y*2",
+    "naïve", "approach—see", "Table", "data;", "\"quoted\"", "e.g.", "Fig.", "end.\n\n",
+    "line\n", "tab\t", "—", "α-β", "→", "a/b",
+]
+
+
+def legacy_preprocess_text(text: str) -> str:
+    """The original preprocess_text: three full-text substitutions"""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,!?;:()\-\'"]+', '', text)
+    text = re.sub(r'\.(?=[A-Z])', '. ', text)
+    return text.strip()
+
+
+def build_text(size_mb: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = size_mb * 2**20
+    parts, length = [], 0
+    while length < target:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50], help="input sizes in MB")
+    parser.add_argument("--page-kb", type=int, default=4, help="piece size for the streamed form")
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    page_size = args.page_kb * 1024
+
+    def streamed(text):
+        pages = (text[i:i + page_size] for i in range(0, len(text), page_size))
+        return "".join(processor.preprocess_iter(pages))
+
+    modes = [("legacy", legacy_preprocess_text), ("fused", processor.preprocess_text), ("streamed", streamed)]
+    print(f"{'MB':>4} {'mode':>9} {'seconds':>8} {'peak MB':>8}")
+    for size_mb in args.sizes:
+        text = build_text(size_mb)
+        expected = None
+        for mode, fn in modes:
+            result, elapsed, peak = measure(fn, text)
+            if expected is None:
+                expected = result
+            assert result == expected, f"{mode} output differs from legacy preprocess_text"
+            del result
+            print(f"{size_mb:>4} {mode:>9} {elapsed:>8.2f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare single-call and map-reduce summarization latency, offline.
+
+Summarizes synthetic documents with GeminiAIAssistant over the local
+stand-in client from bench_context_cache.py, made to take a base latency
+plus a time per prompt token on every call. Reports wall-clock time and
+call count for one call over the whole text and for the map-reduce tree,
+and checks that every sentence of the document reached some model call.
+
+Usage:
+    python benchmarks/bench_summary.py [--tokens 50000 200000] [--chunk-tokens 16000] [--workers 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from bench_context_cache import LocalGeminiClient  # noqa: E402
+from gemini_ai_assistant import GeminiAIAssistant  # noqa: E402
+
+
+class _SlowModels:
+    """Delays each stand-in call like a model whose latency grows with the prompt"""
+
+    def __init__(self, client, base: float, per_1k_tokens: float):
+        self.prompts = []
+        self._generate = client.aio.models.generate_content
+        self._base = base
+        self._per_1k_tokens = per_1k_tokens
+        client.aio.models.generate_content = self.generate_content
+
+    async def generate_content(self, **kwargs):
+        response = await self._generate(**kwargs)
+        self.prompts.append(kwargs["contents"])
+        await asyncio.sleep(self._base + self._per_1k_tokens * response.usage_metadata.prompt_token_count / 1000)
+        return response
+
+
+def measure(text: str, chunk_tokens: int, workers: int, base: float, per_1k_tokens: float):
+    client = LocalGeminiClient()
+    calls = _SlowModels(client, base, per_1k_tokens)
+    assistant = GeminiAIAssistant(client=client, summary_chunk_tokens=chunk_tokens, summary_workers=workers)
+    started = time.perf_counter()
+    assistant.generate_summary(text)
+    elapsed = time.perf_counter() - started
+    seen = "".join(calls.prompts)
+    covered = all(sentence in seen for sentence in text.split(". ") if sentence)
+    return elapsed, len(calls.prompts), covered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--chunk-tokens", type=int, default=16000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--base-latency", type=float, default=0.5, help="seconds per call")
+    parser.add_argument("--latency-per-1k", type=float, default=0.05, help="seconds per 1000 prompt tokens")
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'mode':>11} {'seconds':>8} {'calls':>6} {'covered':>8}")
+    for tokens in args.tokens:
+        text = ". ".join(f"Sentence {i} reports result {i * 7 % 1000}" for i in range(tokens // 8)) + "."
+        for mode, chunk_tokens in (("single", tokens * 2), ("map-reduce", args.chunk_tokens)):
+            elapsed, calls, covered = measure(text, chunk_tokens, args.workers, args.base_latency, args.latency_per_1k)
+            print(f"{tokens:>8} {mode:>11} {elapsed:>8.2f} {calls:>6} {str(covered):>8}")
+
+
+if __name__ == "__main__":
+    main()
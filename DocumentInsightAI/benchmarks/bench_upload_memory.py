@@ -0,0 +1,86 @@
+"""Compare peak RSS of the legacy temp-file upload path and UploadedFile ingestion.
+
+Each mode runs in a fresh subprocess so ru_maxrss is not shared between them.
+
+Usage:
+    python benchmarks/bench_upload_memory.py [--pages 2000]
+"""
+import argparse
+import io
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+# Imported up front so module import cost is part of every mode's baseline
+import PyPDF2
+from document_processor import DocumentProcessor
+from uploads import UploadedFile
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_legacy(pdf_path: str):
+    """Replicates the original upload_document: save to a temp file, read it back, copy into BytesIO"""
+    with open(pdf_path, "rb") as spooled:
+        temp_file = tempfile.NamedTemporaryFile(delete=False)
+        shutil.copyfileobj(spooled, temp_file)
+        temp_file.close()
+    with open(temp_file.name, "rb") as f:
+        data = f.read()
+    text = ""
+    for page in PyPDF2.PdfReader(io.BytesIO(data)).pages:
+        text += page.extract_text() + "\n"
+    os.unlink(temp_file.name)
+    return text.strip()
+
+
+def run_streaming(pdf_path: str):
+    """Hands the spooled upload to DocumentProcessor as a seekable stream"""
+    with UploadedFile.from_path(pdf_path, os.path.basename(pdf_path), "application/pdf") as upload:
+        return DocumentProcessor().extract_text(upload)
+
+
+def child(mode: str, pdf_path: str):
+    baseline = peak_rss_mb()
+    text = {"legacy": run_legacy, "streaming": run_streaming}[mode](pdf_path)
+    print(f"{mode},{baseline:.1f},{peak_rss_mb():.1f},{len(text)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    from bench_pdf_extraction import build_pdf
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(build_pdf(args.pages))
+    try:
+        print(f"PDF: {args.pages} pages, {os.path.getsize(f.name) / 2**20:.1f} MB")
+        print(f"{'mode':>10} {'start MB':>9} {'peak MB':>8} {'delta MB':>9}")
+        for mode in ("legacy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, f.name],
+                check=True, capture_output=True, text=True
+            ).stdout.strip().splitlines()[-1]
+            _, start, peak, _ = out.split(",")
+            print(f"{mode:>10} {float(start):>9.1f} {float(peak):>8.1f} {float(peak) - float(start):>9.1f}")
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
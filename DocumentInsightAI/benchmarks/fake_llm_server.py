@@ -0,0 +1,237 @@
+"""Local fake of the Gemini and OpenAI HTTP APIs with injectable faults.
+
+Serves canned replies in the formats the assistants parse for Gemini
+generateContent, streamGenerateContent (SSE) and cachedContents, and for
+OpenAI chat completions. A share of requests can be failed with an HTTP
+error or left hanging, and an outage window fails every request, to
+exercise the LLM transport's deadlines, retries and circuit breaker
+without touching the real services.
+
+Usage:
+    python benchmarks/fake_llm_server.py --port 8090 --fail-rate 0.2 --hang-rate 0.05
+    LLM_BASE_URL=http://127.0.0.1:8090 python backend/app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Any, Dict, Optional, Tuple
+
+_GENERATE = re.compile(r"/models/([^/:]+):(generateContent|streamGenerateContent)$")
+_CACHE = re.compile(r"/cachedContents(?:/([^/]+))?$")
+
+
+def _tokens(text: str) -> int:
+    return -(-len(text) // 4)
+
+
+def _reply(prompt: str, json_mode: bool) -> str:
+    """A canned reply in the format the prompt asks for"""
+    if json_mode:
+        if '"questions"' in prompt:
+            return json.dumps({"questions": ["What is the method?", "What are the results?", "What are the limits?"]})
+        evaluation = {"score": 7, "feedback": "Mostly correct.", "justification": "Matches the document."}
+        objects = re.search(r"exactly (\d+) objects", prompt)
+        return json.dumps([evaluation] * int(objects.group(1)) if objects else evaluation)
+    if "generate exactly 3" in prompt:
+        return "1. What is the method?\n2. What are the results?\n3. What are the limitations?"
+    return "Answer: A fake answer.\nJustification: A fake justification."
+
+
+class FakeLLMServer:
+    """Threaded fake LLM server; ``start`` it in the background or ``serve_forever`` in the foreground"""
+
+    def __init__(self, port: int = 8090, latency: float = 0.05, fail_rate: float = 0.0, fail_status: int = 503,
+                 hang_rate: float = 0.0, hang_seconds: float = 120, outage: Optional[Tuple[float, float]] = None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        # (start, end) seconds after start-up during which every request fails
+        self.outage = outage
+        self.requests = 0
+        self.failed = 0
+        self.caches: Dict[str, int] = {}
+        self._ids = count(1)
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        threading.Thread(target=self._httpd.serve_forever, name="fake-llm", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _fault(self) -> Optional[str]:
+        """'fail', 'hang' or None for the next request"""
+        with self._lock:
+            self.requests += 1
+            elapsed = time.monotonic() - self._started
+            if self.outage and self.outage[0] <= elapsed < self.outage[1]:
+                self.failed += 1
+                return "fail"
+            roll = random.random()
+            if roll < self.fail_rate:
+                self.failed += 1
+                return "fail"
+            if roll < self.fail_rate + self.hang_rate:
+                return "hang"
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: Any):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _handle(self):
+                body = self._read()
+                path = self.path.split("?")[0]
+                fault = server._fault()
+                if fault == "hang":
+                    time.sleep(server.hang_seconds)
+                time.sleep(server.latency)
+                if fault == "fail":
+                    return self._send(server.fail_status, {"error": {
+                        "code": server.fail_status, "message": "Injected failure", "status": "UNAVAILABLE"
+                    }})
+                generate = _GENERATE.search(path)
+                if generate and self.command == "POST":
+                    return self._generate(body, generate.group(1), generate.group(2) == "streamGenerateContent")
+                cache = _CACHE.search(path)
+                if cache:
+                    return self._cache(body, cache.group(1))
+                if path.endswith("/chat/completions") and self.command == "POST":
+                    return self._chat(body)
+                self._send(404, {"error": {"code": 404, "message": f"No route for {path}", "status": "NOT_FOUND"}})
+
+            def _generate(self, body: Dict[str, Any], model: str, stream: bool):
+                prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                                 for part in content.get("parts", []))
+                cached = 0
+                if body.get("cachedContent"):
+                    cached = server.caches.get(body["cachedContent"].split("/")[-1])
+                    if cached is None:
+                        return self._send(404, {"error": {"code": 404, "message": "Cached content not found",
+                                                          "status": "NOT_FOUND"}})
+                json_mode = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+                text = _reply(prompt, json_mode)
+                usage = {
+                    "promptTokenCount": _tokens(prompt) + cached,
+                    "candidatesTokenCount": _tokens(text),
+                    "totalTokenCount": _tokens(prompt) + cached + _tokens(text),
+                    "cachedContentTokenCount": cached or None
+                }
+
+                def response(part: str) -> Dict[str, Any]:
+                    return {
+                        "candidates": [{"content": {"role": "model", "parts": [{"text": part}]},
+                                        "finishReason": "STOP", "index": 0}],
+                        "usageMetadata": usage,
+                        "modelVersion": model
+                    }
+
+                if not stream:
+                    return self._send(200, response(text))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for part in re.findall(r"\S+\s*", text):
+                    self.wfile.write(f"data: {json.dumps(response(part))}\r\n\r\n".encode())
+                    self.wfile.flush()
+                    time.sleep(server.latency / 10)
+                self.close_connection = True
+
+            def _cache(self, body: Dict[str, Any], cache_id: Optional[str]):
+                if self.command == "POST" and cache_id is None:
+                    cache_id = f"fake-{next(server._ids)}"
+                    text = "".join(part.get("text", "") for content in body.get("contents", [])
+                                   for part in content.get("parts", []))
+                    server.caches[cache_id] = _tokens(text)
+                elif cache_id not in server.caches:
+                    return self._send(404, {"error": {"code": 404, "message": "Cached content not found",
+                                                      "status": "NOT_FOUND"}})
+                elif self.command == "DELETE":
+                    del server.caches[cache_id]
+                    return self._send(200, {})
+                self._send(200, {
+                    "name": f"cachedContents/{cache_id}",
+                    "model": body.get("model", ""),
+                    "usageMetadata": {"totalTokenCount": server.caches[cache_id]}
+                })
+
+            def _chat(self, body: Dict[str, Any]):
+                prompt = "".join(message.get("content") or "" for message in body.get("messages", []))
+                json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+                text = _reply(prompt, json_mode)
+                if not json_mode:
+                    text = text.replace("Answer:", "ANSWER:").replace("Justification:", "JUSTIFICATION:")
+                self._send(200, {
+                    "id": f"chatcmpl-fake-{next(server._ids)}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", ""),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(text),
+                              "total_tokens": _tokens(prompt) + _tokens(text)}
+                })
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests delayed by --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=120)
+    parser.add_argument("--outage", type=float, nargs=2, metavar=("START", "END"),
+                        help="seconds after start-up between which every request fails")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.port, args.latency, args.fail_rate, args.fail_status,
+                           args.hang_rate, args.hang_seconds, tuple(args.outage) if args.outage else None)
+    print(f"Fake LLM server on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+// Files larger than this are sent in parts through /api/uploads (the single-request limit is 16 MB)
+const CHUNKED_UPLOAD_THRESHOLD = 15 * 1024 * 1024;
+const PART_ATTEMPTS = 3;
+
 class DocumentAnalyzer {
     constructor() {
         this.sessionId = null;
@@ -151,20 +155,26 @@ class DocumentAnalyzer {
 
         this.showLoading('Analyzing your document...');
 
-        const formData = new FormData();
-        formData.append('file', file);
-
         try {
-            const response = await fetch('/api/upload', {
-                method: 'POST',
-                body: formData
-            });
-
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
+            let job;
+            if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                job = await this.uploadInParts(file);
+            } else {
+                const formData = new FormData();
+                formData.append('file', file);
+
+                const response = await fetch('/api/upload?async=1', {
+                    method: 'POST',
+                    body: formData
+                });
+
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                job = await response.json();
             }
 
-            const data = await response.json();
+            const data = await this.waitForJob(job.status_url);
             this.showDocumentAnalysis(data);
             
         } catch (error) {
@@ -175,6 +185,74 @@ class DocumentAnalyzer {
         }
     }
 
+    async uploadInParts(file) {
+        // Send a large file part by part, resending any part whose transfer fails, then queue it for processing
+        const startResponse = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        if (!startResponse.ok) {
+            throw new Error(`HTTP error! status: ${startResponse.status}`);
+        }
+        const upload = await startResponse.json();
+
+        const loadingText = document.getElementById('loadingText');
+        for (let part = 1; part <= upload.parts; part++) {
+            loadingText.textContent = `Uploading part ${part} of ${upload.parts}...`;
+            const blob = file.slice((part - 1) * upload.part_size, part * upload.part_size);
+            const headers = { 'Content-Type': 'application/octet-stream' };
+            if (window.crypto && crypto.subtle) {
+                const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+                headers['X-Part-SHA256'] = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+            }
+
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    const response = await fetch(`${upload.status_url}/parts/${part}`, { method: 'PUT', headers, body: blob });
+                    if (response.ok) break;
+                    if (attempt >= PART_ATTEMPTS) throw new Error(`HTTP error! status: ${response.status}`);
+                } catch (error) {
+                    if (attempt >= PART_ATTEMPTS) throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+        }
+
+        const response = await fetch(`${upload.status_url}/complete?async=1`, { method: 'POST' });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return response.json();
+    }
+
+    async waitForJob(statusUrl, interval = 1000) {
+        // Poll an upload job until it finishes, mirroring its progress in the loading overlay
+        while (true) {
+            const response = await fetch(statusUrl);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const job = await response.json();
+            if (job.stage === 'done') {
+                return job;
+            }
+            if (job.stage === 'failed') {
+                throw new Error(job.error || 'Document processing failed');
+            }
+
+            const loadingText = document.getElementById('loadingText');
+            if (job.stage === 'extracting' && job.progress) {
+                loadingText.textContent = `Extracting page ${job.progress.current} of ${job.progress.total}...`;
+            } else if (job.stage === 'summarizing') {
+                loadingText.textContent = 'Summarizing your document...';
+            }
+
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    }
+
     showDocumentAnalysis(data) {
         this.sessionId = data.session_id;
         
@@ -236,7 +314,7 @@ class DocumentAnalyzer {
         this.showTypingIndicator();
         
         try {
-            const response = await fetch('/api/ask', {
+            const response = await fetch('/api/ask-stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -251,10 +329,31 @@ class DocumentAnalyzer {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
-            
-            // Hide typing indicator
+            // Show the answer as it streams in, then replace it with the final parse
+            let streamingMessage = null;
+            let partialAnswer = '';
+            let data = null;
+            for await (const event of this.readServerSentEvents(response)) {
+                if (event.event === 'answer') {
+                    if (!streamingMessage) {
+                        this.hideTypingIndicator();
+                        streamingMessage = this.addMessageToChat('', 'ai');
+                    }
+                    partialAnswer += event.data.text;
+                    streamingMessage.querySelector('.message-content p').textContent = partialAnswer;
+                } else if (event.event === 'done') {
+                    data = event.data;
+                }
+            }
+
+            if (!data) {
+                throw new Error('Answer stream ended early');
+            }
+
             this.hideTypingIndicator();
+            if (streamingMessage) {
+                streamingMessage.remove();
+            }
             
             // Add AI response to chat
             this.addMessageToChat(data.answer, 'ai', data.justification);
@@ -273,6 +372,30 @@ class DocumentAnalyzer {
         }
     }
 
+    async *readServerSentEvents(response) {
+        // Parse a text/event-stream body into {event, data} objects
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                }
+                yield { event, data: data ? JSON.parse(data) : null };
+            }
+        }
+    }
+
     addMessageToChat(text, sender, justification = null) {
         const chatMessages = document.getElementById('chatMessages');
         const messageDiv = document.createElement('div');
@@ -309,6 +432,7 @@ class DocumentAnalyzer {
         
         // Scroll to bottom
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv;
     }
 
     showTypingIndicator() {
@@ -385,6 +509,15 @@ class DocumentAnalyzer {
             `;
             content.appendChild(questionDiv);
         });
+
+        const submitAllDiv = document.createElement('div');
+        submitAllDiv.className = 'question-actions';
+        submitAllDiv.innerHTML = `
+            <button class="btn btn-primary" onclick="app.evaluateAll()">
+                <i class="fas fa-check-double"></i> Submit All Answers
+            </button>
+        `;
+        content.appendChild(submitAllDiv);
     }
 
     async evaluateAnswer(questionIndex) {
@@ -423,6 +556,46 @@ class DocumentAnalyzer {
         }
     }
 
+    async evaluateAll() {
+        const answers = this.challengeQuestions.map((_, index) =>
+            document.getElementById(`answer-${index}`).value.trim()
+        );
+
+        if (!answers.some(answer => answer) || this.isProcessing) return;
+
+        this.showLoading('Evaluating your answers...');
+
+        try {
+            const response = await fetch('/api/evaluate-all', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    answers: answers,
+                    session_id: this.sessionId
+                })
+            });
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const data = await response.json();
+            data.evaluations.forEach((evaluation, index) => {
+                if (evaluation) {
+                    this.displayEvaluation(index, evaluation);
+                }
+            });
+            
+        } catch (error) {
+            console.error('Evaluation error:', error);
+            this.showError('Failed to evaluate answers. Please try again.');
+        } finally {
+            this.hideLoading();
+        }
+    }
+
     displayEvaluation(questionIndex, evaluation) {
         const evaluationDiv = document.getElementById(`evaluation-${questionIndex}`);
         evaluationDiv.innerHTML = `
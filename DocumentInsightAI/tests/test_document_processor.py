@@ -0,0 +1,62 @@
+import io
+import random
+import re
+
+import pytest
+
+import document_processor
+from document_processor import DocumentProcessor
+
+
+# Characters around which the three substitutions interact: whitespace runs,
+# special characters between a period and a capital, and ordinary text
+PREPROCESS_ALPHABET = ["a", "B", "Z", "1", "_", ".", ",", "'", "-", " ", "  ", "\n", "\t", "\r\n", "—", "*", "é", "→", "[", "]"]
+
+
+def legacy_preprocess_text(text: str) -> str:
+    """The original preprocess_text: three full-text substitutions"""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,!?;:()\-\'"]+', '', text)
+    text = re.sub(r'\.(?=[A-Z])', '. ', text)
+    return text.strip()
+
+
+def _random_texts(count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield rng, "".join(rng.choice(PREPROCESS_ALPHABET) for _ in range(rng.randint(0, 40)))
+
+
+def test_preprocess_text_matches_three_pass_version():
+    processor = DocumentProcessor()
+    for _, text in _random_texts(5000, seed=1):
+        assert processor.preprocess_text(text) == legacy_preprocess_text(text), repr(text)
+
+
+def test_preprocess_iter_matches_three_pass_version_at_any_split():
+    processor = DocumentProcessor()
+    for rng, text in _random_texts(5000, seed=2):
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 6)))
+        pieces = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        assert "".join(processor.preprocess_iter(pieces)) == legacy_preprocess_text(text), repr(pieces)
+
+
+def _decode_txt(data: bytes) -> str:
+    return DocumentProcessor()._extract_txt_text(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 64 * 1024])
+@pytest.mark.parametrize("text, encoding", [
+    ("a" * 70000 + " Café naïve", "latin1"),
+    ("a" * 70000 + " “smart quotes”", "cp1252"),
+    ("héllo wörld ✓ " * 10000, "utf-8"),
+])
+def test_txt_encoding_is_chosen_at_first_non_ascii_byte(monkeypatch, block_size, text, encoding):
+    monkeypatch.setattr(document_processor, "TXT_BLOCK_SIZE", block_size)
+    data = text.encode(encoding)
+    # Same result as decoding the whole file as UTF-8, falling back to Latin-1
+    try:
+        expected = data.decode("utf-8")
+    except UnicodeDecodeError:
+        expected = data.decode("latin1")
+    assert _decode_txt(data) == expected.strip()